@@ -2,11 +2,12 @@
 # Author: Rick Gelhausen
 import sys, argparse
 import os.path
-import glob
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+from intarnaOutput import readOutput
+from resultCatalog import findResults
+
 
 ########################################################################################################################
 #                                                                                                                      #
@@ -138,19 +139,20 @@ def main(argv):
     if not os.path.exists(os.path.join(args.inputPath,args.benchID)):
         sys.exit("Filepath does not exist!!!")
 
-    sRNAfiles = glob.glob(os.path.join(args.inputPath, args.benchID, "*"))
-    sRNAfiles = [x for x in sRNAfiles if "memoryUsage" not in x and "runTime" not in x and ".txt" not in x and "benchmark" not in x]
+    # plain and compressed IntaRNA outputs of the result catalog
+    sRNAfiles = [x["path"] for x in findResults(args.inputPath, [args.benchID])]
 
     numberOfStackingsList = []
     maxLengthList = []
     helixLengthList = []
     for sRNA in sRNAfiles:
         try:
-            df = pd.read_csv(sRNA, sep=";")
+            # only the hybrids of the first 200 interactions are parsed
+            df = readOutput(sRNA, ["hybridDP"], nrows=200)
         except:
             continue
 
-        helixData = df["hybridDP"].tolist()[:200]
+        helixData = df["hybridDP"].tolist()
 
         interactionLengthList = []
 
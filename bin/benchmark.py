@@ -2,36 +2,35 @@
 # Author: Rick Gelhausen, adapted from perl script by Patrick Wright
 import sys, argparse
 import os.path
+import hashlib
+import numpy as np
 import pandas as pd
-import glob
 
-def main(argv):
-    parser = argparse.ArgumentParser(description="Benchmark IntaRNA")
-    parser.add_argument("-i", "--infile", action="store", dest="verified_interactions", default=os.path.join(".", "verified_interactions.csv")
-                        , help= "location of the file containing the verified interactions.")
-    parser.add_argument("-o", "--outfile", action="store", dest="outputfile", default=os.path.join(".", "benchmark.csv")
-                        , help="path of the benchmark outputfile.")
-    parser.add_argument("-p", "--callDirs", action="store", dest="directoryPath", default=os.path.join(".", "output")
-                        , help="path to directory containing the output of the calls script. ")
-    parser.add_argument("-c", "--callID", action="store", dest="callID", default=""
-                        , help="a mandatory ID to differentiate between multiple calls of the script.")
-    args = parser.parse_args()
-
-    # Check whether a callID was given
-    if args.callID == "":
-        sys.exit("No callID was specified! Please specify a callID using -c <name> or --callID=<name>")
-
-    # read verified interactions
-    if os.path.exists(args.verified_interactions) == True:
-        with open(args.verified_interactions) as data:
+from intarnaOutput import readOutput
+from rankSidecar import sidecarRanks
+from resultCatalog import findResults
+from jobManifest import fileChecksum, loadManifest
+
+########################################################################################################################
+#                                                                                                                      #
+#                 Rank the verified interactions within the IntaRNA outputs of a callID (benchmark.csv).               #
+#        Each output file is ranked on its own, so calls.py ranks the outputs as soon as they are finalized and        #
+#               appends the ranks to benchmark.csv, which is rewritten in the canonical order at the end.              #
+#     A fingerprint of the outputs and verified interactions is stored with it, so unchanged callIDs are not ranked    #
+#                                           again (see benchmarkAll.py).                                               #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Read the verified interactions.
+# return: dictionary with the verified (target_ltag, target_name) tuples of each (srna, organism) ("hybrids")
+#         and the srnas and organisms in the order of the file ("srnas", "organisms")
+def readVerifiedInteractions(verified_interactions):
+    if os.path.exists(verified_interactions) == True:
+        with open(verified_interactions) as data:
             tempHybrid = [line.strip() for line in data]
     else:
-        sys.exit("Error: %s! File not found!" % (args.verified_interactions))
-
-    # check whether the callID is valid (no file with that name exists)
-    outputPath = os.path.join(args.directoryPath, args.callID, args.outputfile)
-    if os.path.exists(outputPath):
-        sys.exit("A file for this callID already exists! Exiting...")
+        sys.exit("Error: %s! File not found!" % (verified_interactions))
 
     # Create a dictionary for better accessibility of srna data
     confirmed_hybrids = dict()
@@ -51,62 +50,169 @@ def main(argv):
         else:
             confirmed_hybrids[(spl[0], spl[3])] = [(spl[1], spl[2])]
 
-    # Get all directories with needed files and sort them
-    srna_files = [x for x in glob.glob(os.path.join(args.directoryPath, args.callID, "*.csv")) if x.split(os.path.sep)[-1].split("_")[0] in srnaList]
-    srna_files.sort()
+    return {"hybrids": confirmed_hybrids, "srnas": srnaList, "organisms": organisms}
+
+
+# Whether the outputs of an srna are benchmarked (it is part of the verified interactions)
+def isBenchmarked(srna_name, verified):
+    return srna_name in verified["srnas"]
+
+
+# The cap of the outputs of a callID (calls.py --topK), 0 if its outputs are complete
+def outputCap(callFolder):
+    manifest = loadManifest(callFolder)
+    return manifest["settings"].get("topK", 0) if manifest is not None else 0
+
+
+# The ranks of the given targets in an output file, parsed from the output
+# topK: cap of the output (see outputCap), only the interactions of the K + 1 lowest energy classes are ranked
+# return: dictionary target id -> rank (targets not in the output or below the cap are left out)
+def outputRanks(file, ltags, topK=0):
+    try:
+        # only the target ids and energies are read (of capped outputs only the rows down to the cap)
+        df = readOutput(file, ["id1", "E"], topK=topK + 1 if topK > 0 else None)
+    except pd.errors.ParserError as err:
+        errorMessage = "%s      in file %s \n\nPlease contact the IntaRNA development team." % (err, file)
+        sys.exit(errorMessage)
+    # The rank of a target is the number of distinct (rounded) energies up to its best interaction.
+    # Only the rounded energies up to the best interaction of the worst verified target are kept, the distinct values
+    # of this subset (np.unique) give the ranks of all verified targets at once (np.searchsorted).
+    energies = df["E"].round(2).to_numpy()
+    verifiedRows = df["id1"].isin(ltags).to_numpy()
+    bestEnergies = pd.Series(energies[verifiedRows]).groupby(df["id1"].to_numpy()[verifiedRows]).min()
+    ranks = dict()
+    if len(bestEnergies) > 0:
+        distinct = np.unique(energies[energies <= bestEnergies.max()])
+        ranks = dict(zip(bestEnergies.index, np.searchsorted(distinct, bestEnergies.to_numpy(), side="right").tolist()))
+    return ranks
+
+
+# Determine the ranks of the verified interactions of an srna and organism predicted in one output file.
+# topK: cap of the output (see outputCap), ranks above it (and targets not in the output) are recorded as topK + 1
+# return: list of benchmark rows (srna_name, organism, index of the interaction, file, target_ltag, target_name, rank)
+def rankOutput(file, verified, srna_name, organism, topK=0):
+    keys = [(srna_name, organism)] if (srna_name, organism) in verified["hybrids"] else []
+    if keys == []:
+        return []
+
+    # the ranks are looked up in the sidecar of the output (see rankSidecar.py), the output is only parsed without it
+    ltags = set(ltag for key in keys for ltag, _ in verified["hybrids"][key])
+    ranks = sidecarRanks(file, ltags)
+    if ranks is None:
+        ranks = outputRanks(file, ltags, topK)
+
+    rows = []
+    for srna_name, organism in keys:
+        for index, (target_ltag, target_name) in enumerate(verified["hybrids"][(srna_name, organism)]):
+            if topK == 0:
+                intaRNA_rank = ranks.get(target_ltag, sys.maxsize)
+            else:
+                # "> topK"
+                intaRNA_rank = min(ranks.get(target_ltag, topK + 1), topK + 1)
+            rows.append((srna_name, organism, index, file, target_ltag, target_name, intaRNA_rank))
+    return rows
+
+
+# Append benchmark rows to the benchmark file of a callID (in order of completion)
+def appendBenchmark(outputPath, callID, rows):
+    with open(outputPath, "a") as f:
+        if f.tell() == 0:
+            print("srna_name;target_ltag;target_name;%s_intarna_rank" % callID, file=f)
+        for row in rows:
+            print("%s;%s;%s;%s" % ((row[0],) + row[4:]), file=f)
+
+
+# Write all benchmark rows of a callID in the canonical order: srnas and organisms in the order of the verified
+# interactions, the interactions of each srna in their order within the file
+def writeBenchmark(outputPath, callID, rows, verified):
+    srnaIndex = dict((srna, i) for i, srna in enumerate(verified["srnas"]))
+    organismIndex = dict((organism, i) for i, organism in enumerate(verified["organisms"]))
+    rows = sorted(rows, key=lambda x: (srnaIndex[x[0]], organismIndex[x[1]], x[2], x[3]))
+
+    outputText = "srna_name;target_ltag;target_name;%s_intarna_rank\n" % callID
+    for row in rows:
+        outputText += "%s;%s;%s;%s\n" % ((row[0],) + row[4:])
+
+    # write csv file
+    with open(outputPath + ".tmp", "w") as csv_file:
+        csv_file.write(outputText)
+    os.replace(outputPath + ".tmp", outputPath)
+
+
+# Fingerprint of the inputs of a benchmark: the verified interactions and the name, size and modification time
+# of each output of the callID (see findResults)
+def benchmarkFingerprint(files, verified_interactions):
+    sha = hashlib.sha256(fileChecksum(verified_interactions).encode())
+    for file in sorted(files):
+        stat = os.stat(file)
+        sha.update(("%s;%d;%d\n" % (os.path.basename(file), stat.st_size, stat.st_mtime_ns)).encode())
+    return sha.hexdigest()
+
+
+# Store the fingerprint of the benchmark written into outputPath (as <outputPath>.fingerprint)
+def writeFingerprint(outputPath, fingerprint):
+    with open(outputPath + ".fingerprint", "w") as f:
+        print(fingerprint, file=f)
+
+
+# Whether the benchmark in outputPath was computed from inputs with the given fingerprint
+def isUpToDate(outputPath, fingerprint):
+    if not os.path.exists(outputPath) or not os.path.exists(outputPath + ".fingerprint"):
+        return False
+    with open(outputPath + ".fingerprint") as f:
+        return f.read().strip() == fingerprint
+
+
+# Benchmark all outputs of a finished callID
+def benchmarkCallID(callID, verified_interactions, directoryPath, outputfile="benchmark.csv"):
+    verified = readVerifiedInteractions(verified_interactions)
+
+    # check whether the callID is valid (no file with that name exists)
+    outputPath = os.path.join(directoryPath, callID, outputfile)
+    if os.path.exists(outputPath):
+        sys.exit("A file for this callID already exists! Exiting...")
+
+    # The outputs of the verified srnas, from the result catalog of the output folder
+    srna_files = findResults(directoryPath, [callID], srnas=set(verified["srnas"]))
 
     # Check whether the needed files for the benchmarking exist
     if srna_files == []:
-        sys.exit("Error!!! No files found for benchmarking ID %s" % args.callID)
-
-    # Create a dictionary from the srna_files for better access
-    srnaDict = dict()
-    for srna in srnaList:
-        for organism in organisms:
-            if (srna, organism) in srnaDict:
-                srnaDict[(srna, organism)].insert([x for x in srna_files if srna in x and organism in x])
-            else:
-                srnaDict[(srna, organism)] = [x for x in srna_files if srna in x and organism in x]
-
-    outputText= "srna_name;target_ltag;target_name;%s_intarna_rank\n" % args.callID
+        sys.exit("Error!!! No files found for benchmarking ID %s" % callID)
 
     # determine the rank of intaRNA given the confirmed hybrids
-    for srna_name in srnaList:
-        for organism in organisms:
-            if (srna_name, organism) in confirmed_hybrids:
-                for confirmed_hybrid in confirmed_hybrids[(srna_name, organism)]:
-                    # redo for each file containing srna_name organism (currently 1)
-                    for file in srnaDict[(srna_name, organism)]:
-                        try:
-                            df = pd.read_csv(file, sep=";", header=0)
-                        except pd.errors.ParserError as err:
-                            errorMessage = "%s      in file %s \n\nPlease contact the IntaRNA development team." % (err, file)
-                            sys.exit(errorMessage)
-                        # round the energys and sort the dataFrame accordingly
-                        df = df.round({"E": 2})
-                        df = df.sort_values(by=["E","id1"])
-
-                        target_ltag = confirmed_hybrid[0]
-                        target_name = confirmed_hybrid[1]
-
-                        try:
-                            # Calculate the real rank
-                            intaRNA_rank = len(set(list(df["E"])[0:list(df["id1"]).index(target_ltag)+1]))
-
-                            outputText += "%s;%s;%s;%s\n" % (srna_name, target_ltag, target_name, intaRNA_rank)
-                        except ValueError:
-                            outputText += "%s;%s;%s;%s\n" % (srna_name, target_ltag, target_name, sys.maxsize)
+    topK = outputCap(os.path.join(directoryPath, callID))
+    rows = []
+    for entry in srna_files:
+        rows += rankOutput(entry["path"], verified, entry["srna"], entry["organism"], topK)
 
     # Check whether the outputFile is empty
-    if outputText == "srna_name;target_ltag;target_name;intarna_rank\n":
+    if rows == []:
         sys.exit("No reasonable output found!")
 
-    # write csv file
-    csv_file = open(os.path.join(outputPath), "w")
-    csv_file.write(outputText)
-    csv_file.close()
+    writeBenchmark(outputPath, callID, rows, verified)
+    writeFingerprint(outputPath, benchmarkFingerprint([x["path"] for x in findResults(directoryPath, [callID])],
+                                                      verified_interactions))
+
+    print("Finished benchmarking: %s" % callID)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark IntaRNA")
+    parser.add_argument("-i", "--infile", action="store", dest="verified_interactions", default=os.path.join(".", "verified_interactions.csv")
+                        , help= "location of the file containing the verified interactions.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputfile", default=os.path.join(".", "benchmark.csv")
+                        , help="path of the benchmark outputfile.")
+    parser.add_argument("-p", "--callDirs", action="store", dest="directoryPath", default=os.path.join(".", "output")
+                        , help="path to directory containing the output of the calls script. ")
+    parser.add_argument("-c", "--callID", action="store", dest="callID", default=""
+                        , help="a mandatory ID to differentiate between multiple calls of the script.")
+    args = parser.parse_args()
+
+    # Check whether a callID was given
+    if args.callID == "":
+        sys.exit("No callID was specified! Please specify a callID using -c <name> or --callID=<name>")
 
-    print("Finished benchmarking: %s" % args.callID)
+    benchmarkCallID(args.callID, args.verified_interactions, args.directoryPath, args.outputfile)
 
 if __name__ == "__main__":
    main(sys.argv[1:])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from jobExecutor import availableCores
+from resultCatalog import loadCatalog, findResults, catalogCallIDs
+from benchmark import readVerifiedInteractions, isBenchmarked, rankOutput, writeBenchmark
+from benchmark import benchmarkFingerprint, writeFingerprint, isUpToDate, outputCap
+from rankStore import readBenchmark, rankMatrix
+
+########################################################################################################################
+#                                                                                                                      #
+#          Benchmark many callIDs at once (e.g. after the verified interactions changed) in a pool of processes.      #
+#      CallIDs whose outputs and verified interactions did not change since their last benchmark are skipped, the     #
+#                     ranks of all given callIDs are written as one merged rank matrix.                                #
+#                                                                                                                      #
+########################################################################################################################
+
+# Verified interactions of each worker process, read once per file
+verifiedMemo = dict()
+
+
+# (Re)rank the outputs of a callID into its benchmark.csv, unless the benchmark is up to date
+# outputs: the catalog entries of the outputs of the callID
+# return: (callID, "ranked"/"unchanged"/error message)
+def rankCallID(verified_interactions, directoryPath, force, callID, outputs):
+    outputPath = os.path.join(directoryPath, callID, "benchmark.csv")
+    fingerprint = benchmarkFingerprint([x["path"] for x in outputs], verified_interactions)
+    if not force and isUpToDate(outputPath, fingerprint):
+        return callID, "unchanged"
+
+    try:
+        if verified_interactions not in verifiedMemo:
+            verifiedMemo[verified_interactions] = readVerifiedInteractions(verified_interactions)
+        verified = verifiedMemo[verified_interactions]
+        topK = outputCap(os.path.join(directoryPath, callID))
+        rows = []
+        for entry in outputs:
+            if isBenchmarked(entry["srna"], verified):
+                rows += rankOutput(entry["path"], verified, entry["srna"], entry["organism"], topK)
+    except SystemExit as e:
+        return callID, str(e)
+    if rows == []:
+        return callID, "No reasonable output found!"
+
+    writeBenchmark(outputPath, callID, rows, verified)
+    writeFingerprint(outputPath, fingerprint)
+    return callID, "ranked"
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark multiple callIDs in parallel and merge their ranks.")
+    parser.add_argument("-i", "--infile", action="store", dest="verified_interactions", default=os.path.join(".", "verified_interactions.csv")
+                        , help="location of the file containing the verified interactions.")
+    parser.add_argument("-p", "--callDirs", action="store", dest="directoryPath", default=os.path.join(".", "output")
+                        , help="path to directory containing the output of the calls script. Default: ./output")
+    parser.add_argument("-c", "--callID", nargs="*", dest="callIDs", default=[]
+                        , help="the callIDs to benchmark. Specify multiple ones by using callID1 callID2 ...")
+    parser.add_argument("-a", "--all", action="store_true", dest="all", default=False
+                        , help="When set all callIDs with IntaRNA outputs in the output folder are benchmarked.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputfile", default=os.path.join(".", "benchmark_matrix.csv")
+                        , help="path of the merged rank matrix of all given callIDs. Default: ./benchmark_matrix.csv")
+    parser.add_argument("-j", "--jobs", action="store", dest="jobs", default=-1, type=int
+                        , help="The number of callIDs benchmarked at the same time, -1 for all available cores. Default: -1")
+    parser.add_argument("-f", "--force", action="store_true", dest="force", default=False
+                        , help="When set all callIDs are ranked again, even if their benchmark is up to date.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.verified_interactions):
+        sys.exit("Error: %s! File not found!" % args.verified_interactions)
+
+    if not os.path.isdir(args.directoryPath):
+        sys.exit("Error!!! The output folder %s does not exist!" % args.directoryPath)
+    catalog = loadCatalog(args.directoryPath)
+    if args.all:
+        callIDs = catalogCallIDs(args.directoryPath, "output", catalog)
+    elif args.callIDs != []:
+        callIDs = args.callIDs
+        for callID in callIDs:
+            if not os.path.isdir(os.path.join(args.directoryPath, callID)):
+                sys.exit("Error!!! No directory found for callID %s!" % callID)
+    else:
+        sys.exit("Please specify the callIDs to benchmark using -c <name1 name2> or -a for all callIDs!")
+    if callIDs == []:
+        sys.exit("Error!!! No callIDs found in %s!" % args.directoryPath)
+
+    nJobs = availableCores() if args.jobs == -1 else max(1, args.jobs)
+    benchmarked = []
+    with ProcessPoolExecutor(max_workers=min(nJobs, len(callIDs))) as pool:
+        for callID, result in pool.map(partial(rankCallID, args.verified_interactions, args.directoryPath, args.force),
+                                       callIDs, [findResults(args.directoryPath, [x], catalog=catalog) for x in callIDs]):
+            if result in ["ranked", "unchanged"]:
+                benchmarked.append(callID)
+                print("%s: %s" % (callID, result))
+            else:
+                print("Error!!! Benchmarking %s failed: %s" % (callID, result))
+
+    if benchmarked == []:
+        sys.exit("Error!!! No callID could be benchmarked!")
+    rankMatrix([readBenchmark(os.path.join(args.directoryPath, callID, "benchmark.csv")) for callID in benchmarked]) \
+        .to_csv(args.outputfile, sep=";", index=False)
+    print("Merged the ranks of %d callIDs into %s!" % (len(benchmarked), args.outputfile))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -4,38 +4,92 @@
 import sys, argparse
 import os
 import glob
+import time
 import shlex
-from subprocess import Popen
-from subprocess import PIPE
-from subprocess import check_output
-from subprocess import STDOUT
-from subprocess import CalledProcessError
+import shutil
+import tempfile
+from itertools import groupby
+from functools import partial
+
+from jobExecutor import runWithLimits, runJobs, runJobsWithinMemory, availableCores, splitCoreBudget, userThreads
+from targetShards import splitTargetFile, mergeShardOutputs
+from jobManifest import createManifest, loadManifest, registerJobs, runTrackedJob, jobStats, recordOutput, allDone
+from jobManifest import updateJob, flushManifest, writeStragglerReport, failureCounts, fileChecksum
+from resultCache import binaryIdentity, cacheKey, fetchResult, storeResult, evictCache
+from edCache import accessibilityArgs, edKey, edArchive, provideED
+from jobBundle import writeBundle
+from runJournal import writeViews
+from runStatus import startTelemetry, stopTelemetry
+from intarnaOutput import compressionEndings, checkCompression, outputName, outputStem, truncateOutput
+from queryBatches import batchQueries, writeBatchQuery, runTrackedBatch
+from costModel import callFeatures, loadHistory, createMemoryModel, predictMemory, observeMemory
+from costModel import planRun, printPlan, reportPlan
+from benchmark import readVerifiedInteractions, isBenchmarked, rankOutput, appendBenchmark, writeBenchmark
+from benchmark import benchmarkFingerprint, writeFingerprint
+from rankSidecar import updateSidecar
+from resultCatalog import findResults
 
 ########################################################################################################################
 #                                                                                                                      #
 #            This script calls intaRNA with custom parameters on a set of sRNA queries and mRNA targets.               #
 #            The script requires a callID to identify the call and to allow parallel runs of the script.               #
-#                   The benchmark.py script is called after building the result files.                                 #
+#             The verified interactions are ranked (benchmark.py) as soon as each result file is final.                #
 #                                                                                                                      #
 ########################################################################################################################
 
 
-# Run a subprocess with the given call and provide process statistics
-def runSubprocess(callArgs):
-    # wait for call to finish and get statistics
-    output = ""
-    try:
-        output = check_output(callArgs,stderr=STDOUT).decode("utf-8")
-    except CalledProcessError as e:
-        print("calling "+(" ".join(e.cmd))+" produced error code "+str(e.returncode)+" and output "+str(e.output))
-    std_out = list(filter(None, output.replace("\t","").split("\n")))
-    # create a dictionary containing output of /usr/bin/time -v
-    stat_dict = dict()
-    for line in std_out:
-        splt = line.split(": ")
-        stat_dict[splt[0]] = splt[1]
-    # Return time and memory usage
-    return stat_dict["User time (seconds)"], stat_dict["Maximum resident set size (kbytes)"]
+# Finalize the outputs of a callID in job order and generate its views (calls.txt, time and memory tables) from the journal.
+# stats holds the time and memory statistics of each job, they arrive as the jobs finish. The outputs of sharded calls
+# are merged (if mergeOutputs is set) as soon as all their shards are done.
+# onOutput (optional) is called with the (first) job of each output file once the file is final.
+def writeTables(callID, callFolder, jobs, stats, manifest, mergeOutputs=True, onOutput=None):
+    for _, group in groupby(zip(jobs, stats), key=lambda x: (x[0]["organism"], x[0]["target_name"])):
+        for _, parts in groupby(group, key=lambda x: x[0]["srna_name"]):
+            parts = [job for job, _ in parts]
+            # shards: the outputs are only merged once all shards are done (and not merged already)
+            if len(parts) > 1 and mergeOutputs and allDone(manifest, [job["key"] for job in parts]) \
+                    and all(os.path.exists(job["partOut"]) for job in parts):
+                mergeShardOutputs([job["partOut"] for job in parts], parts[0]["out"])
+                recordOutput(manifest, os.path.basename(parts[0]["out"]), parts[0]["out"])
+            if onOutput is not None and allDone(manifest, [job["key"] for job in parts]) \
+                    and os.path.exists(parts[0]["out"]):
+                onOutput(parts[0])
+
+    flushManifest(manifest)
+    writeViews(callID, callFolder, manifest["journal"])
+
+
+# Truncate a final output to its top K energy classes and all interactions of the verified targets of its srna (--topK).
+# The checksum of the output in the manifest is updated, so the output still counts as complete when resuming.
+def capOutput(manifest, job, topK, verified):
+    keepTargets = [ltag for ltag, _ in verified["hybrids"].get((job["srna_name"], job["organism"]), [])]
+    if not truncateOutput(job["out"], topK, keepTargets):
+        return
+    if job["partOut"] == job["out"]:
+        updateJob(manifest, job["key"], checksum=fileChecksum(job["out"]))
+    else:
+        recordOutput(manifest, os.path.basename(job["out"]), job["out"])
+
+
+# Time and memory statistics of all jobs in job order.
+# Jobs that are not reused are run (concurrently) in the meantime, their resource records are taken from the manifest.
+# results are the results of the run units (single jobs or batches) with the given keys, in this order.
+def jobResults(jobs, reused, unitKeys, results, manifest):
+    finished = set()
+    pending = zip(unitKeys, results)
+    for job in jobs:
+        if not reused[job["key"]]:
+            unit = job.get("batch", job["key"])
+            while unit not in finished:
+                finished.add(next(pending)[0])
+        yield jobStats(manifest, job["key"])
+
+
+# Pass the results of the run units through and keep the resource record of each unit (by its key) in records
+def recordResults(units, results, records):
+    for unit, record in zip(units, results):
+        records[unit["key"]] = record
+        yield record
 
 def main(argv):
     fastaFileEndings = [".fasta", ".fa"]
@@ -60,14 +114,65 @@ def main(argv):
                         , help="The path to the file containing the verified interactions.")
     parser.add_argument("-m", "--maxInteractionLength", action="store", dest="maxInteractionLength", default="150"
                         , help="The maximum interaction length used in the precomputation of the target ED values.")
+    parser.add_argument("-j", "--jobs", action="store", dest="jobs", default=1, type=int
+                        , help="The number of IntaRNA calls running at the same time. Default: 1")
+    parser.add_argument("--cores", action="store", dest="cores", default=0, type=int
+                        , help="The number of cores shared by all concurrent calls, the remaining cores of each call are "
+                               "used as IntaRNA threads. Use -1 for all available cores (NSLOTS on SGE). Default: --jobs")
+    parser.add_argument("-s", "--shards", action="store", dest="shards", default=1, type=int
+                        , help="Split each target file into this many length-balanced shards that are called in parallel. "
+                               "The outputs of the shards are merged afterwards. Default: 1")
+    parser.add_argument("--shardFolder", action="store", dest="shardFolder", default=""
+                        , help="Folder of the target shards, shared by callIDs with the same input and --shards (e.g. the "
+                               "configurations of a sweep). Existing shards are reused. Default: the shards folder of the callID")
+    parser.add_argument("--memoryBudget", action="store", dest="memoryBudget", default=0, type=float
+                        , help="Memory of the node in gigabytes. Concurrent calls are only started while their predicted "
+                               "peak memory fits into this budget. Default: 0 (no memory limit)")
+    parser.add_argument("--timeout", action="store", dest="timeout", default=0, type=float
+                        , help="Wall time limit of each IntaRNA call in seconds, calls exceeding it are killed. Default: 0 (no limit)")
+    parser.add_argument("--memoryLimit", action="store", dest="memoryLimit", default=0, type=float
+                        , help="Address space limit of each IntaRNA call in gigabytes (RLIMIT_AS). Default: 0 (no limit)")
+    parser.add_argument("--retries", action="store", dest="retries", default=0, type=int
+                        , help="Number of retries of failed calls (not for timeouts). After running out of memory, the memory "
+                               "limit of the retry is raised by --retryMemoryFactor. Default: 0")
+    parser.add_argument("--retryDelay", action="store", dest="retryDelay", default=10, type=float
+                        , help="Delay before the first retry in seconds, doubled for each further retry. Default: 10")
+    parser.add_argument("--retryMemoryFactor", action="store", dest="retryMemoryFactor", default=2, type=float
+                        , help="Factor the memory limit is raised by when retrying a call that ran out of memory. Default: 2")
+    parser.add_argument("--stragglerFactor", action="store", dest="stragglerFactor", default=3, type=float
+                        , help="Calls taking longer than this factor times the median wall time are reported in "
+                               "stragglers.csv. Default: 3")
+    parser.add_argument("--statusInterval", action="store", dest="statusInterval", default=10, type=float
+                        , help="Interval in seconds in which the progress of the run is written into status.json and "
+                               "status.prom of the callID folder (see status.py). Default: 10")
+    parser.add_argument("--plan", action="store_true", dest="plan", default=False
+                        , help="Only plan the calls: predict their CPU-hours, peak memory and makespan with the given --jobs "
+                               "from the runtime and memory tables of earlier callIDs in the output folder. Nothing is run.")
+    parser.add_argument("--bundle", action="store", dest="bundleFolder", default=""
+                        , help="Export all calls as a job bundle (task list, task wrapper, SGE array job and xargs runner) "
+                               "into the given folder instead of running them. Collect the results with ingestBundle.py.")
+    parser.add_argument("--resume", action="store_true", dest="resume", default=False
+                        , help="Resume an existing callID. Only calls that are missing or failed are run again.")
+    parser.add_argument("--cache", action="store", dest="cacheFolder", default=""
+                        , help="Folder of a result cache shared between callIDs. Identical IntaRNA calls (same binary, "
+                               "arguments and input files) reuse the cached output instead of being recomputed.")
+    parser.add_argument("--cacheSize", action="store", dest="cacheSize", default=50, type=float
+                        , help="Maximal size of the result cache in gigabytes. Default: 50")
+    parser.add_argument("--batch", action="store", dest="batch", default=0, type=int
+                        , help="Combine the queries of each organism into this many length-balanced batches. Each batch is "
+                               "handled by one IntaRNA call per target file (or shard) and its output is split by query. "
+                               "Default: 0 (one call per query)")
+    parser.add_argument("--topK", action="store", dest="topK", default=0, type=int
+                        , help="Keep only the interactions of the K lowest energy classes (and of the verified targets) in "
+                               "each output. Ranks above K are recorded as K + 1 in the benchmark. Default: 0 (keep all)")
+    parser.add_argument("--compress", action="store", dest="compression", default="none", choices=list(compressionEndings)
+                        , help="Store the IntaRNA outputs compressed, they are streamed from the stdout of IntaRNA into "
+                               "the compressor (zstd needs the python module zstandard). Default: none")
 
     #   Warning  Prefix matching rules apply to parse_known_args().
     #  The parser may consume an option even if it’s just a prefix of one of its known options, instead of leaving it in the remaining arguments list.
     args, cmdLineArgs = parser.parse_known_args()
 
-    # Get the path of the executables in order to determine the location of other scripts
-    executablePath = os.path.dirname(__file__)
-
     # Remaining argument options are used for IntaRNA
     cmdLineArgs = " ".join(cmdLineArgs)
 
@@ -92,54 +197,65 @@ def main(argv):
     if not os.path.exists(args.intaRNAbinary):
         sys.exit("Error!!! IntaRNA filePath does not exist! Please specify it using -b <intaRNAbinary>!")
 
+    # The verified interactions are needed to rank the outputs while the calls run
+    if not args.noJobStart and args.bundleFolder == "" and not args.plan:
+        verified = readVerifiedInteractions(args.verified_interactions)
+
+    checkCompression(args.compression)
+
+    if args.batch > 0 and args.bundleFolder != "":
+        sys.exit("Error!!! Query batches (--batch) can not be exported as a bundle!")
+    if args.plan and (args.bundleFolder != "" or args.noJobStart):
+        sys.exit("Error!!! A plan (--plan) can not be combined with --bundle or --callsOnly!")
+
+    # Bundles are run on other nodes, so all paths have to be absolute
+    if args.bundleFolder != "":
+        if os.path.exists(args.bundleFolder):
+            sys.exit("Error!!! The bundle folder %s already exists!" % args.bundleFolder)
+        args.inputPath = os.path.abspath(args.inputPath)
+        args.intaRNAbinary = os.path.abspath(args.intaRNAbinary)
+        if args.shardFolder != "":
+            args.shardFolder = os.path.abspath(args.shardFolder)
+
+    # Settings that have to be equal when resuming a callID
+    callFolder = os.path.join(args.outputPath, args.callID) if args.bundleFolder == "" else os.path.abspath(args.bundleFolder)
+    settings = {"callID": args.callID, "intaRNAbinary": args.intaRNAbinary, "inputPath": args.inputPath,
+                "arguments": cmdLineArgs, "shards": args.shards, "withTargetED": args.enabledTargetED}
+    if args.compression != "none":
+        settings["compression"] = args.compression
+    if args.batch > 0:
+        settings["batch"] = args.batch
+    if args.topK > 0:
+        settings["topK"] = args.topK
+
+    # A plan prepares the calls (shards and batches) in a temporary folder, the callID is not created
+    if args.plan:
+        callFolder = tempfile.mkdtemp(prefix=args.callID + "-plan-")
     # Create outputFolder for this callID if not existing
-    if not os.path.exists(os.path.join(args.outputPath, args.callID)):
-        os.makedirs(os.path.join(args.outputPath, args.callID))
+    elif not os.path.exists(callFolder):
+        os.makedirs(callFolder)
+        manifest = createManifest(callFolder, settings)
+    elif args.resume:
+        manifest = loadManifest(callFolder)
+        if manifest is None:
+            sys.exit("Error!!! No manifest found for callID %s, it can not be resumed!" % args.callID)
+        if manifest["settings"] != settings:
+            sys.exit("Error!!! The callID %s was started with different settings: %s" % (args.callID, manifest["settings"]))
+        # the views are rebuilt from the journal, the benchmark from the outputs
+        for fileName in ["calls.txt", "runTime.csv", "memoryUsage.csv", "benchmark.csv"]:
+            if os.path.exists(os.path.join(callFolder, fileName)):
+                os.remove(os.path.join(callFolder, fileName))
     else:
-        sys.exit("Error!!! A directory for callID %s already exists!" % args.callID)
+        sys.exit("Error!!! A directory for callID %s already exists! Use --resume to continue it." % args.callID)
 
     # Organisms
     organisms = [x.split(os.path.sep)[-1] for x in glob.glob(os.path.join(args.inputPath, "*")) if os.path.isdir(x)]
     if organisms == []:
         sys.exit("Input folder is empty!")
 
-
-    # Compute target ED-value files for each organism and option enabled (if not existant)
-    if (args.enabledTargetED):
-        print("Preprocessing target ED-values!!")
-        for organism in organisms:
-            target_files = []
-            for ending in fastaFileEndings:
-                target_files.extend(glob.glob(os.path.join(args.inputPath, organism, "target", "*" + ending)))
-            target_files.sort()
-
-            for target in target_files:
-                target_name = os.path.basename(os.path.splitext(target)[0])
-                edValueFolder = os.path.join(args.outputPath, "ED-values", organism, target_name)
-                if not os.path.exists(edValueFolder):
-                    os.makedirs(edValueFolder)
-                    call = args.intaRNAbinary + " -q " + "AAAAAAAA" \
-                                              + " -t " + target + " --noSeed" \
-                                              + " -n 0 --out=/dev/null" \
-                                              + " --out=tAcc:" + os.path.join(edValueFolder, "intarna.target.ed")
-
-                    # if user enables threading, also add it to the precomputation of target ED values
-                    if "threads " in cmdLineArgs:
-                        call += " --threads " + cmdLineArgs.split("threads ")[-1].split(" ")[0]
-                    elif "threads=" in cmdLineArgs:
-                        call += " --threads=" + cmdLineArgs.split("threads=")[-1].split(" ")[0]
-
-                    # call
-                    callArgs = shlex.split(call, posix=False)
-                    runSubprocess(callArgs)
-
-        print("Preprocessing completed!")
-
-    # Filepaths
-    callLogFilePath = os.path.join(args.outputPath, args.callID, "calls.txt")
-    timeLogFilePath = os.path.join(args.outputPath, args.callID, "runTime.csv")
-    memoryLogFilePath = os.path.join(args.outputPath, args.callID, "memoryUsage.csv")
-
+    # Query and target files of each organism
+    srnaFiles = dict()
+    targetFiles = dict()
     for organism in organisms:
         # check if query and target folder exist
         if not os.path.exists(os.path.join(args.inputPath, organism, "query")):
@@ -147,84 +263,303 @@ def main(argv):
         if not os.path.exists(os.path.join(args.inputPath, organism, "target")):
             sys.exit("Error!!! Could not find target path for %s!" % organism)
 
-
         srna_files = []
         target_files = []
         for ending in fastaFileEndings:
             srna_files.extend(glob.glob(os.path.join(args.inputPath, organism, "query", "*" + ending)))
             target_files.extend(glob.glob(os.path.join(args.inputPath, organism, "target", "*" + ending)))
 
-        # Sort input
-        srna_files.sort()
-        target_files.sort()
-
         # Check whether input exists
         if len(srna_files) == 0:
             sys.exit("Error!!! No srna fasta files found in query folder!")
         if len(target_files) == 0:
             sys.exit("Error!!! No target fasta files found in target folder!")
 
-        for target_file in target_files:
+        # Sort input
+        srnaFiles[organism] = sorted(srna_files)
+        targetFiles[organism] = sorted(target_files)
+
+    # Split the target files into length-balanced shards that are called independently.
+    # targetParts[target_file] holds (part name, fasta file) tuples, the unsplit target file is its only part.
+    # The outputs of the shards are written into the shards folder of the callID.
+    shardFolder = os.path.join(callFolder, "shards")
+    shardInputFolder = args.shardFolder if args.shardFolder != "" else shardFolder
+    targetParts = dict()
+    for organism in organisms:
+        for target_file in targetFiles[organism]:
+            target_name = os.path.basename(os.path.splitext(target_file)[0])
+            if args.shards > 1:
+                shards = splitTargetFile(target_file, args.shards, os.path.join(shardInputFolder, organism, target_name))
+                if not os.path.exists(os.path.join(shardFolder, organism, target_name)):
+                    os.makedirs(os.path.join(shardFolder, organism, target_name))
+                targetParts[target_file] = [(target_name + "_" + os.path.basename(os.path.splitext(x)[0]), x) for x in shards]
+            else:
+                targetParts[target_file] = [(target_name, target_file)]
+
+    # The core budget shared by all concurrent calls
+    cores = args.cores if args.cores > 0 else (availableCores() if args.cores == -1 else args.jobs)
+
+    # Identity of the IntaRNA binary, part of the ED-value and result cache keys
+    binaryId = binaryIdentity(args.intaRNAbinary) if args.enabledTargetED or args.cacheFolder != "" else None
+
+    # Provide the target ED-value files for each organism and option enabled.
+    # They are taken from the ED cache (keyed by target content and accessibility arguments) or computed in parallel,
+    # and unpacked into the callID folder for the calls of this run.
+    edFiles = dict()
+    if (args.enabledTargetED):
+        print("Preprocessing target ED-values!!")
+        edArgs = accessibilityArgs(cmdLineArgs, args.maxInteractionLength)
+        edJobs = []
+        for organism in organisms:
+            for target_file in targetFiles[organism]:
+                target_name = os.path.basename(os.path.splitext(target_file)[0])
+                for part_name, target in targetParts[target_file]:
+                    archive = edArchive(os.path.join(args.outputPath, "ED-values"), organism, target_name,
+                                        edKey(binaryId, target, edArgs))
+                    edFiles[(organism, part_name)] = os.path.join(callFolder, "ED-values", organism, part_name + ".ed")
+                    edJobs.append((target, archive, edFiles[(organism, part_name)]))
+
+        # if user enables threading, also add it to the precomputation of target ED values
+        nEdJobs, edThreads = splitCoreBudget(cores, args.jobs, len(edJobs), cmdLineArgs)
+        if edThreads is None:
+            edThreads = userThreads(cmdLineArgs)
+        # a plan only needs the names of the ED-value files
+        for _ in runJobs(edJobs if not args.plan else [], nEdJobs,
+                         runner=partial(provideED, args.intaRNAbinary, edArgs, edThreads)):
+            pass
+
+        print("Preprocessing completed!")
+
+    # IntaRNA call, compressed outputs are streamed from stdout into the compressor
+    def intaRNACall(query, target, partOut, edFile):
+        call = args.intaRNAbinary + " -q " + query \
+                                  + " -t " + target \
+                                  + " --out " + (partOut if args.compression == "none" else "STDOUT") \
+                                  + " --outMode C " \
+                                  + cmdLineArgs
+        if (args.enabledTargetED):
+            call += " --tAcc=E --tAccFile=" + edFile
+        return call
+
+    # Collect all (organism, query, target part) calls first, they are independent of each other
+    jobs = []
+    for organism in organisms:
+        for target_file in targetFiles[organism]:
             target_name = os.path.basename(os.path.splitext(target_file)[0])
-            # Variables to create the timeLog table
-            header = "callID;target_name;Organism"
-            timeLine = "%s;%s;%s" % (args.callID, target_name, organism)
-            memoryLine = "%s;%s;%s" % (args.callID, target_name, organism)
 
-            for srna_file in srna_files:
+            for srna_file in srnaFiles[organism]:
                 srna_name = srna_file.split(os.path.sep)[-1].split("_")[0]
-                header += ";%s" % srna_name
 
                 # Outputfilepath
-                out = os.path.join(args.outputPath, args.callID, srna_name + "_" + target_name + ".csv")
-
-                # IntaRNA call
-                call = args.intaRNAbinary + " -q " + srna_file \
-                                          + " -t " + target_file \
-                                          + " --out " + out \
-                                          + " --outMode C " \
-                                          + cmdLineArgs
-
-                if (args.enabledTargetED):
-                    call += " --tAcc=E --tAccFile=" \
-                         + os.path.join(args.outputPath, "ED-values", organism, target_name, "intarna.target.ed") \
-
-                print(call, file=open(callLogFilePath, "a"))
-                if not args.noJobStart:
-                    # add stats to call
-                    call = "/usr/bin/time -v " + call
-                    # split call for subprocess creation
-                    callArgs = shlex.split(call, posix=False)
-                    # do call and get process information
-                    timeCall, maxMemory = runSubprocess(callArgs)
-                    # store process information
-                    # Time in seconds
-                    timeLine += ";" + timeCall
-                    # Convert to megabyte (MB)
-                    memoryLine += ";" + maxMemory
-                else:
-                    # store that process information not available (NA)
-                    timeLine += ";NA"
-                    memoryLine += ";NA"
-
-            if not os.path.exists(timeLogFilePath):
-                # print header if file is empty
-                print(header, file=open(timeLogFilePath, "a"))
-            print(timeLine, file=open(timeLogFilePath, "a"))
-
-            if not os.path.exists(memoryLogFilePath):
-                # print header if file is empty
-                print(header, file=open(memoryLogFilePath, "a"))
-            print(memoryLine, file=open(memoryLogFilePath, "a"))
+                out = outputName(os.path.join(callFolder, srna_name + "_" + target_name + ".csv"), args.compression)
+
+                for part_name, target in targetParts[target_file]:
+                    # shards write into the shard folder and are merged into out afterwards
+                    partOut = out
+                    if len(targetParts[target_file]) > 1:
+                        partOut = outputName(os.path.join(shardFolder, organism, target_name,
+                                                          srna_name + "_" + part_name + ".csv"), args.compression)
+
+                    edFile = edFiles.get((organism, part_name))
+                    call = intaRNACall(srna_file, target, partOut, edFile)
+
+                    jobs.append({"key": os.path.relpath(partOut, callFolder), "organism": organism,
+                                 "target_name": target_name, "srna_name": srna_name, "query": srna_file,
+                                 "target": target, "edFile": edFile, "out": out, "partOut": partOut, "call": call,
+                                 "stream": partOut if args.compression != "none" else None})
+
+    # Query batches: the queries of an organism are combined into length-balanced multi-FASTA files, each batch is
+    # called once per target part and its output is split into the outputs of the single queries afterwards
+    batchFolder = os.path.join(callFolder, "batches")
+    batches = []
+    if args.batch > 0:
+        for organism in organisms:
+            queryBatches = batchQueries(srnaFiles[organism], args.batch)
+            for i, queryFiles in enumerate(queryBatches):
+                batchName = "batch%dof%d" % (i + 1, len(queryBatches))
+                batchQuery = os.path.join(batchFolder, organism, batchName + ".fa")
+                writeBatchQuery(queryFiles, batchQuery)
+                for target_file in targetFiles[organism]:
+                    for part_name, target in targetParts[target_file]:
+                        partOut = outputName(os.path.join(batchFolder, organism, part_name + "_" + batchName + ".csv"),
+                                             args.compression)
+                        edFile = edFiles.get((organism, part_name))
+                        batches.append({"key": os.path.relpath(partOut, callFolder), "organism": organism,
+                                        "query": batchQuery, "target": target, "partOut": partOut,
+                                        "call": intaRNACall(batchQuery, target, partOut, edFile),
+                                        "stream": partOut if args.compression != "none" else None,
+                                        "members": [job for job in jobs if job["organism"] == organism
+                                                    and job["target"] == target and job["query"] in queryFiles]})
+        # batches are run in the order of their first query, so the outputs are finalized in job order
+        position = dict((job["key"], i) for i, job in enumerate(jobs))
+        batches.sort(key=lambda batch: position[batch["members"][0]["key"]])
+    units = batches if args.batch > 0 else jobs
+
+    # Divide the cores between concurrent calls and IntaRNA threads
+    nJobs, threads = splitCoreBudget(cores, args.jobs, len(units), cmdLineArgs)
+    if threads is not None and (args.jobs > 1 or args.cores != 0):
+        for unit in units:
+            unit["call"] += " --threads=%d" % threads
+
+    # the queries of a batch are computed by the call of their batch
+    for batch in batches:
+        batch["log"] = os.path.join(callFolder, "logs", outputStem(batch["key"]))
+        for job in batch["members"]:
+            job["batch"] = batch["key"]
+            job["call"] = batch["call"]
+
+    # Predict the resources of all calls from the tables of earlier callIDs (not needed for a bundle)
+    intaRNAThreads = threads if threads is not None else \
+        (int(userThreads(cmdLineArgs)) if (userThreads(cmdLineArgs) or "").isdigit() else 1)
+    if args.plan or (not args.noJobStart and args.bundleFolder == ""):
+        for unit in units:
+            unit["features"] = callFeatures(unit["query"], unit["target"])
+        runtimeHistory = loadHistory(args.outputPath, args.inputPath, "runTime.csv", cmdLineArgs)
+        memoryHistory = loadHistory(args.outputPath, args.inputPath, "memoryUsage.csv", cmdLineArgs)
+    if args.plan:
+        shutil.rmtree(callFolder)
+        plan = planRun(units, nJobs, intaRNAThreads, runtimeHistory, memoryHistory, args.memoryBudget * 1024 ** 2)
+        if plan is None:
+            sys.exit("Error!!! No runtime and memory tables of earlier callIDs found in %s to plan the calls!"
+                     % args.outputPath)
+        printPlan(plan)
+        return
+
+    # Jobs that already finished in an earlier (interrupted) run of this callID are not run again
+    complete = registerJobs(manifest, jobs)
+    writeViews(args.callID, callFolder, manifest["journal"])
+
+    # the output of each call is logged into the logs folder
+    for job in jobs:
+        job["log"] = os.path.join(callFolder, "logs", outputStem(job["key"]))
+
+    # Limits of each call and the retries of failed calls
+    limits = {"wallTime": args.timeout, "memory": args.memoryLimit * 1024 ** 3, "retries": args.retries,
+              "retryDelay": args.retryDelay, "memoryFactor": args.retryMemoryFactor}
+
+    # Export the calls as a job bundle for batch systems instead of running them here
+    if args.bundleFolder != "":
+        writeBundle(callFolder, args.callID, jobs, threads if threads is not None else int(userThreads(cmdLineArgs) or 1),
+                    limits)
+        print("Created a bundle of %d tasks in %s!" % (len(jobs), callFolder))
+        return
+
+    # Reuse the outputs of identical calls from the result cache
+    cached = dict((job["key"], False) for job in jobs)
+    onDone = None
+    if args.cacheFolder != "" and not args.noJobStart:
+        for job in jobs:
+            inputFiles = [job["query"], job["target"]] + ([job["edFile"]] if args.enabledTargetED else [])
+            job["cacheKey"] = cacheKey(binaryId, cmdLineArgs + (" --tAcc=E" if args.enabledTargetED else "")
+                                       + (" --compress=" + args.compression if args.compression != "none" else ""), inputFiles)
+            if complete[job["key"]]:
+                continue
+            meta = fetchResult(args.cacheFolder, job["cacheKey"], job["partOut"])
+            if meta is not None and meta.get("resources") is not None:
+                updateJob(manifest, job["key"], state="done", resources=meta["resources"],
+                          checksum=meta["checksum"], cached=True)
+                cached[job["key"]] = True
+        print("Reusing %d cached results!" % sum(cached.values()))
+        onDone = lambda job, record: storeResult(args.cacheFolder, job["cacheKey"], job["partOut"],
+                                                 {"resources": record, "call": job["call"]})
+
+    if not args.noJobStart:
+        # split the calls for subprocess creation
+        for unit in units:
+            unit["callArgs"] = shlex.split(unit["call"], posix=False)
+        reused = dict((job["key"], complete[job["key"]] or cached[job["key"]]) for job in jobs)
+        if args.batch > 0:
+            # a batch is run as long as one of its queries is missing
+            runnable = [batch for batch in batches if not all(reused[job["key"]] for job in batch["members"])]
+            runner = partial(runTrackedBatch, manifest, partial(runWithLimits, limits), onDone=onDone)
+        else:
+            runnable = [job for job in jobs if not reused[job["key"]]]
+            runner = partial(runTrackedJob, manifest, partial(runWithLimits, limits), onDone=onDone)
+        # the plan of the calls that are run, it is compared with their actual resource usage at the end
+        plan = planRun(runnable, nJobs, intaRNAThreads, runtimeHistory, memoryHistory, args.memoryBudget * 1024 ** 2)
+        if plan is not None:
+            printPlan(plan)
+        start = time.monotonic()
+        telemetry = startTelemetry(callFolder, args.callID, manifest, [job["key"] for job in jobs], cores,
+                                   args.statusInterval)
+        if args.memoryBudget > 0:
+            # admission control: predict the peak memory of each call from earlier callIDs and sequence lengths
+            memoryBudget = args.memoryBudget * 1024 ** 2
+            model = createMemoryModel(memoryHistory, default=memoryBudget / nJobs)
+            print("Memory model based on %d earlier calls!" % len(memoryHistory))
+            results = runJobsWithinMemory(runnable, nJobs, memoryBudget,
+                                          partial(predictMemory, model), partial(observeMemory, model), runner)
+        else:
+            results = runJobs(runnable, nJobs, runner=runner)
+        unitRecords = dict()
+        stats = jobResults(jobs, reused, [unit["key"] for unit in runnable], recordResults(runnable, results, unitRecords),
+                           manifest)
+    else:
+        # store that process information not available (NA)
+        stats = [("NA", "NA") for _ in jobs]
+
+    # Rank the verified interactions of each output as soon as it is final (and truncated to its top K energy classes),
+    # benchmark.csv grows during the run. The ranks of all targets are kept in the sidecar of the output.
+    benchmarkPath = os.path.join(callFolder, "benchmark.csv")
+    benchmarkRows = []
+    def rankFinalOutput(job):
+        if args.topK > 0:
+            capOutput(manifest, job, args.topK, verified)
+        updateSidecar(job["out"])
+        if isBenchmarked(job["srna_name"], verified):
+            rows = rankOutput(job["out"], verified, job["srna_name"], job["organism"], args.topK)
+            benchmarkRows.extend(rows)
+            appendBenchmark(benchmarkPath, args.callID, rows)
+
+    # Results arrive in the order of the jobs, write one row per organism and target file once all its queries finished
+    writeTables(args.callID, callFolder, jobs, stats, manifest, mergeOutputs=not args.noJobStart,
+                onOutput=rankFinalOutput if not args.noJobStart else None)
+
+    # Report failed calls by their cause and the stragglers of the run
+    if not args.noJobStart:
+        stopTelemetry(telemetry)
+        if plan is not None:
+            reportPlan(os.path.join(callFolder, "plan.json"), plan, unitRecords, time.monotonic() - start)
+        failures = failureCounts(manifest, [job["key"] for job in jobs])
+        if failures != dict():
+            print("Failed calls: %s" % ", ".join("%d %s" % (n, failure) for failure, n in sorted(failures.items())))
+        nStragglers = writeStragglerReport(os.path.join(callFolder, "stragglers.csv"), jobs, manifest, args.stragglerFactor)
+        if nStragglers > 0:
+            print("%d stragglers reported in %s!" % (nStragglers, os.path.join(callFolder, "stragglers.csv")))
+
+    # Keep the result cache within its size limit
+    if args.cacheFolder != "" and not args.noJobStart:
+        evictCache(args.cacheFolder, args.cacheSize * 1024 ** 3)
+
+    # Shard inputs are only needed during the run (kept for --resume if calls failed)
+    if args.shards > 1 and not args.noJobStart and os.path.exists(shardFolder) \
+            and allDone(manifest, [job["key"] for job in jobs]):
+        shutil.rmtree(shardFolder)
+
+    # Batch queries are only needed during the run (kept for --resume if calls failed)
+    if args.batch > 0 and not args.noJobStart and os.path.exists(batchFolder) \
+            and allDone(manifest, [job["key"] for job in jobs]):
+        shutil.rmtree(batchFolder)
+
+    # The unpacked ED-values are only needed during the run, they stay compressed in the ED cache
+    if args.enabledTargetED and not args.noJobStart and os.path.exists(os.path.join(callFolder, "ED-values")):
+        shutil.rmtree(os.path.join(callFolder, "ED-values"))
 
     if not args.noJobStart:
-        # Start benchmarking for this callID
-        callBenchmark = "python3 " + os.path.join(executablePath, "benchmark.py") \
-                                   + " -c " + args.callID \
-                                   + " -i " + args.verified_interactions \
-                                   + " -p " + args.outputPath
-        with Popen(shlex.split(callBenchmark, posix=False), stdout=PIPE) as process:
-            print(str(process.stdout.read(), "utf-8"))
+        # Rewrite the benchmark of this callID in the canonical order
+        if benchmarkRows == []:
+            sys.exit("Error!!! No files found for benchmarking ID %s" % args.callID)
+        writeBenchmark(benchmarkPath, args.callID, benchmarkRows, verified)
+        # the benchmark lacks the interactions of failed calls, without fingerprint it is ranked again (--resume,
+        # benchmarkAll.py) instead of being taken as complete
+        if failures != dict():
+            if os.path.exists(benchmarkPath + ".fingerprint"):
+                os.remove(benchmarkPath + ".fingerprint")
+            print("The benchmark of %s is incomplete (failed calls), resume the callID to complete it!" % args.callID)
+        else:
+            writeFingerprint(benchmarkPath, benchmarkFingerprint([x["path"] for x in findResults(args.outputPath, [args.callID])],
+                                                                 args.verified_interactions))
+        print("Finished benchmarking: %s" % args.callID)
 
 
 if __name__ == "__main__":
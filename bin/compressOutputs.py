@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import shutil
+from functools import partial
+
+from jobExecutor import runJobs, availableCores
+from jobManifest import loadManifest, saveManifest, fileChecksum
+from intarnaOutput import compressionEndings, checkCompression, compressionOf, outputName, openOutput
+from resultCatalog import loadCatalog, findResults
+
+########################################################################################################################
+#                                                                                                                      #
+#                 Compress the IntaRNA outputs of existing callID folders (gzip/zstd), files are handled in parallel.  #
+#         Each file is replaced only after its compressed copy is complete, the manifest of the callID is updated,    #
+#                               so the callID can be resumed with calls.py --compress afterwards.                      #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Compress a plain output file and replace it by the compressed file
+# return: (plain file, compressed file)
+def compressFile(compression, path):
+    compressed = outputName(path, compression)
+    with open(path, "rb") as plain, openOutput(compressed + ".tmp", "wb", compression) as packed:
+        shutil.copyfileobj(plain, packed, 1 << 20)
+    os.replace(compressed + ".tmp", compressed)
+    os.remove(path)
+    return path, compressed
+
+
+# Rename the outputs in the manifest of a callID to the given compression and record the new checksums of the
+# compressed outputs. Jobs of shards (and other parts) are renamed alike, their merged output stays their proof of
+# completion, so a resume with calls.py --compress reuses them.
+def updateManifest(callFolder, compression, compressed):
+    manifest = loadManifest(callFolder)
+    if manifest is None:
+        return
+    packedFiles = dict((os.path.relpath(plain, callFolder), packed) for plain, packed in compressed)
+    for key in [x for x in manifest["jobs"] if compressionOf(x) == "none"]:
+        entry = manifest["jobs"].pop(key)
+        if key in packedFiles and entry.get("checksum") is not None:
+            entry["checksum"] = fileChecksum(packedFiles[key])
+        manifest["jobs"][outputName(key, compression)] = entry
+    for plain, packed in compressed:
+        if os.path.basename(plain) in manifest["outputs"]:
+            del manifest["outputs"][os.path.basename(plain)]
+            manifest["outputs"][os.path.basename(packed)] = fileChecksum(packed)
+    manifest["settings"]["compression"] = compression
+    saveManifest(manifest)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compress the IntaRNA outputs of existing callIDs.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder containing the callID folders. Default: ./output")
+    parser.add_argument("-c", "--callID", nargs="*", dest="callIDs", default=[]
+                        , help="the callIDs to compress. Specify multiple ones by using callID1 callID2 ...")
+    parser.add_argument("-a", "--all", action="store_true", dest="all", default=False
+                        , help="When set all callIDs of the output folder are compressed.")
+    parser.add_argument("--compress", action="store", dest="compression", default="gzip",
+                        choices=[x for x in compressionEndings if x != "none"]
+                        , help="the compression to use. Default: gzip")
+    parser.add_argument("-j", "--jobs", action="store", dest="jobs", default=1, type=int
+                        , help="The number of files compressed at the same time, -1 for all available cores. Default: 1")
+    args = parser.parse_args()
+
+    checkCompression(args.compression)
+
+    catalog = loadCatalog(args.outputPath)
+    if args.all:
+        callIDs = sorted(catalog)
+    elif args.callIDs != []:
+        callIDs = args.callIDs
+        for callID in callIDs:
+            if callID not in catalog:
+                sys.exit("Error!!! No directory found for callID %s!" % callID)
+    else:
+        sys.exit("Please specify the callIDs to compress using -c <name1 name2> or -a for all callIDs!")
+
+    # plain outputs of all callIDs, compressed in one parallel run
+    files = [x["path"] for x in findResults(args.outputPath, callIDs, catalog=catalog) if x["format"] == "none"]
+    nJobs = availableCores() if args.jobs == -1 else args.jobs
+    compressed = dict()
+    for plain, packed in runJobs(files, nJobs, runner=partial(compressFile, args.compression)):
+        compressed.setdefault(os.path.dirname(plain), []).append((plain, packed))
+
+    for callFolder, pairs in compressed.items():
+        updateManifest(callFolder, args.compression, pairs)
+        print("Compressed %d outputs of %s!" % (len(pairs), os.path.basename(callFolder)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+import os
+import json
+import glob
+import heapq
+import threading
+
+from targetShards import readFastaRecords
+from jobManifest import loadManifest
+from resultCache import normalizeArguments
+from resultCatalog import findResults, tableKinds
+
+########################################################################################################################
+#                                                                                                                      #
+#                    Predict the resource usage of IntaRNA calls from earlier callIDs and sequence lengths.           #
+#         The peak memory is modelled linearly in the size of the largest DP problem (query length x longest target)   #
+#                          and refined with every call that finishes during the current run.                            #
+#       The runtime is modelled linearly in the summed DP size (query length x target length), a run is planned by     #
+#            scheduling the predicted calls on the concurrent jobs (CPU-hours, peak memory and makespan).               #
+#                                                                                                                      #
+########################################################################################################################
+
+fastaFileEndings = [".fasta", ".fa"]
+
+# Sequence statistics of fasta files, each file is read only once
+sequenceMemo = dict()
+sequenceLock = threading.Lock()
+
+
+# Summed and maximal record length of a fasta file
+# return: (total length, longest record)
+def sequenceLengths(fastaFile):
+    with sequenceLock:
+        if fastaFile not in sequenceMemo:
+            lengths = [sum(len(l.strip()) for l in lines) for _, lines in readFastaRecords(fastaFile)]
+            sequenceMemo[fastaFile] = (sum(lengths), max(lengths) if lengths else 0)
+        return sequenceMemo[fastaFile]
+
+
+# The features of a call with the given query and target file
+def callFeatures(queryFile, targetFile):
+    queryLength, longestQuery = sequenceLengths(queryFile)
+    targetLength, longestTarget = sequenceLengths(targetFile)
+    return {"queryLength": queryLength, "longestQuery": longestQuery, "targetLength": targetLength,
+            "longestTarget": longestTarget}
+
+
+# Size of the largest DP problem of a call, the dominating term of its peak memory.
+# IntaRNA handles the queries of a (batch) query file one after another, so the longest one counts.
+def memoryFeature(features):
+    return features["longestQuery"] * features["longestTarget"]
+
+
+# Summed size of all DP problems of a call (every query against every target), the dominating term of its runtime
+def runtimeFeature(features):
+    return features["queryLength"] * features["targetLength"]
+
+
+# Find the fasta file of a query or target of an organism in the input folder (None if not found)
+def findInput(inputPath, organism, kind, name):
+    pattern = name + "_*" if kind == "query" else name
+    for ending in fastaFileEndings:
+        found = sorted(glob.glob(os.path.join(inputPath, organism, kind, pattern + ending)))
+        if found != []:
+            return found[0]
+    return None
+
+
+# Read the measurements of a table of calls.py (runTime.csv/memoryUsage.csv) of all callIDs in outputPath.
+# Only callIDs run with the given IntaRNA arguments are used, if there are any, otherwise all callIDs.
+# return: list of (features, measured value)
+def loadHistory(outputPath, inputPath, tableName, cmdLineArgs):
+    matching = []
+    other = []
+    tables = [x["path"] for x in findResults(outputPath, kind=tableKinds[tableName])] if os.path.isdir(outputPath) else []
+    for table in tables:
+        manifest = loadManifest(os.path.dirname(table))
+        sameArguments = manifest is not None \
+            and normalizeArguments(manifest["settings"]["arguments"]) == normalizeArguments(cmdLineArgs)
+        with open(table) as f:
+            header = f.readline().strip().split(";")
+            for line in f:
+                row = line.strip().split(";")
+                if len(row) != len(header):
+                    continue
+                targetFile = findInput(inputPath, row[2], "target", row[1])
+                for srna, value in zip(header[3:], row[3:]):
+                    queryFile = findInput(inputPath, row[2], "query", srna)
+                    if value == "NA" or targetFile is None or queryFile is None:
+                        continue
+                    observation = (callFeatures(queryFile, targetFile), float(value))
+                    (matching if sameArguments else other).append(observation)
+    return matching if matching != [] else other
+
+
+# Least squares fit of y = a + b * x
+# return: (a, b)
+def fitLine(points):
+    n = len(points)
+    meanX = sum(x for x, _ in points) / n
+    meanY = sum(y for _, y in points) / n
+    varX = sum((x - meanX) ** 2 for x, _ in points)
+    if varX == 0:
+        return meanY, 0.0
+    b = sum((x - meanX) * (y - meanY) for x, y in points) / varX
+    # memory never shrinks with larger problems
+    b = max(b, 0.0)
+    return meanY - b * meanX, b
+
+
+# Create a memory model from the history of earlier callIDs (in kilobytes)
+# default: prediction used as long as there are no measurements
+# margin: safety factor applied to all predictions
+def createMemoryModel(history, default, margin=1.2):
+    model = {"points": [(memoryFeature(features), value) for features, value in history], "observed": dict(),
+             "default": default, "margin": margin, "lock": threading.Lock(), "line": None}
+    if model["points"] != []:
+        model["line"] = fitLine(model["points"])
+    return model
+
+
+# Predicted peak memory of a job in kilobytes.
+# Earlier measurements of the same query and target are preferred over the fitted line.
+def predictMemory(model, job):
+    with model["lock"]:
+        key = (job["query"], job["target"])
+        if key in model["observed"]:
+            return model["observed"][key] * model["margin"]
+        if model["line"] is None:
+            return model["default"]
+        a, b = model["line"]
+        return max(a + b * memoryFeature(job["features"]), 0) * model["margin"]
+
+
+# Learn from the measured peak memory of a finished job (record is None for failed jobs)
+def observeMemory(model, job, record):
+    if record is None:
+        return
+    with model["lock"]:
+        key = (job["query"], job["target"])
+        model["observed"][key] = max(model["observed"].get(key, 0), record["maxRSS"])
+        model["points"].append((memoryFeature(job["features"]), record["maxRSS"]))
+        model["line"] = fitLine(model["points"])
+
+
+# Predict the CPU time (seconds) and peak memory (kilobytes) of each call from the history of earlier callIDs.
+# calls: jobs or batches with their features, threads: IntaRNA threads of each call
+# return: dictionary call key -> (cpu time, wall time, peak memory), None if there is no history to learn from
+def predictCalls(calls, runtimeHistory, memoryHistory, threads):
+    if runtimeHistory == [] or memoryHistory == []:
+        return None
+    timeLine = fitLine([(runtimeFeature(features), value) for features, value in runtimeHistory])
+    memoryLine = fitLine([(memoryFeature(features), value) for features, value in memoryHistory])
+    predictions = dict()
+    for call in calls:
+        cpuTime = max(timeLine[0] + timeLine[1] * runtimeFeature(call["features"]), 0)
+        memory = max(memoryLine[0] + memoryLine[1] * memoryFeature(call["features"]), 0)
+        # the threads of a call share its CPU time
+        predictions[call["key"]] = (cpuTime, cpuTime / max(threads, 1), memory)
+    return predictions
+
+
+# Schedule calls as the job executor does: in their given order on nJobs concurrent slots, a call is only started
+# while the memory of all running calls stays within memoryBudget (0 for no limit), a call above the budget runs alone.
+# calls: list of (wall time, peak memory)
+# return: (makespan, peak memory of all concurrent calls)
+def simulateSchedule(calls, nJobs, memoryBudget=0):
+    running = []
+    now, used, peak = 0.0, 0.0, 0.0
+    for wallTime, memory in calls:
+        while running != [] and (len(running) >= nJobs or (memoryBudget > 0 and used + memory > memoryBudget)):
+            end, released = heapq.heappop(running)
+            now = max(now, end)
+            used -= released
+        heapq.heappush(running, (now + wallTime, memory))
+        used += memory
+        peak = max(peak, used)
+    return max([now] + [end for end, _ in running]), peak
+
+
+# Plan a run: predicted CPU-hours, peak memory (kilobytes) and makespan (seconds) of the given calls
+# return: plan dictionary (None if there is no history to learn from)
+def planRun(calls, nJobs, threads, runtimeHistory, memoryHistory, memoryBudget=0):
+    predictions = predictCalls(calls, runtimeHistory, memoryHistory, threads)
+    if predictions is None:
+        return None
+    makespan, peakMemory = simulateSchedule([predictions[call["key"]][1:] for call in calls], nJobs, memoryBudget)
+    return {"calls": len(calls), "jobs": nJobs, "threads": threads, "history": len(runtimeHistory),
+            "cpuHours": sum(x[0] for x in predictions.values()) / 3600, "peakMemory": peakMemory,
+            "largestCall": max([x[2] for x in predictions.values()] + [0]), "makespan": makespan,
+            "predictions": predictions}
+
+
+# Human readable duration (h:mm:ss)
+def formatDuration(seconds):
+    hours, rest = divmod(int(round(seconds)), 3600)
+    return "%d:%02d:%02d" % (hours, rest // 60, rest % 60)
+
+
+# Print the summary of a plan
+def printPlan(plan):
+    print("Plan of %d calls (%d concurrent jobs with %d threads each), learned from %d earlier calls:"
+          % (plan["calls"], plan["jobs"], plan["threads"], plan["history"]))
+    print("  CPU-hours:    %.2f" % plan["cpuHours"])
+    print("  peak memory:  %.2f GB (largest call %.2f GB)" % (plan["peakMemory"] / 1024 ** 2,
+                                                              plan["largestCall"] / 1024 ** 2))
+    print("  makespan:     %s" % formatDuration(plan["makespan"]))
+
+
+# Compare a plan with the resource records of the calls run (None for failed calls) and the measured makespan.
+# The comparison is printed and stored together with the predictions of each call in planPath (plan.json of the callID).
+def reportPlan(planPath, plan, records, makespan):
+    finished = dict((key, record) for key, record in records.items() if record is not None)
+    predicted = [plan["predictions"][key] for key in finished]
+    actual = {"calls": len(finished), "makespan": round(makespan, 3),
+              "cpuHours": sum(x["userTime"] for x in finished.values()) / 3600,
+              "largestCall": max([x["maxRSS"] for x in finished.values()] + [0])}
+    print("Predicted versus actual (%d of %d calls finished):" % (len(finished), plan["calls"]))
+    print("  CPU-hours:    %.2f / %.2f" % (sum(x[0] for x in predicted) / 3600, actual["cpuHours"]))
+    print("  largest call: %.2f GB / %.2f GB" % (max([x[2] for x in predicted] + [0]) / 1024 ** 2,
+                                                 actual["largestCall"] / 1024 ** 2))
+    print("  makespan:     %s / %s" % (formatDuration(plan["makespan"]), formatDuration(makespan)))
+
+    report = dict(plan, actual=actual,
+                  predictions=dict((key, {"cpuTime": round(cpuTime, 3), "wallTime": round(wallTime, 3),
+                                          "maxRSS": int(memory), "actual": records.get(key)})
+                                   for key, (cpuTime, wallTime, memory) in plan["predictions"].items()))
+    with open(planPath + ".tmp", "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    os.replace(planPath + ".tmp", planPath)
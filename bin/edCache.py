@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import os
+import gzip
+import fcntl
+import shutil
+import hashlib
+from subprocess import check_output
+from subprocess import STDOUT
+from subprocess import CalledProcessError
+
+from jobManifest import fileChecksum
+from resultCache import normalizeArguments, inputChecksum
+
+########################################################################################################################
+#                                                                                                                      #
+#                  Cache of precomputed target ED-values, shared by all callIDs using the same ED folder.              #
+#       The key covers the target sequences and all IntaRNA arguments that influence the target accessibility.         #
+#          ED files are computed once under a lock, published atomically and stored gzip compressed.                   #
+#                                                                                                                      #
+########################################################################################################################
+
+# IntaRNA arguments that change the target ED-values
+accessibilityArguments = ["--tAccW", "--tAccL", "--tAccConstr", "--tIntLenMax", "--temperature", "--energy", "--energyVRNA"]
+
+# Accessibility relevant IntaRNA arguments that name a file, its content is part of the cache key
+fileArguments = ["--energyVRNA"]
+
+
+# The accessibility relevant IntaRNA arguments of the given command line (normalized to --opt=value).
+# The maximal interaction length of the ED precomputation is used unless the user set --tIntLenMax.
+def accessibilityArgs(cmdLineArgs, maxInteractionLength):
+    args = [x for x in normalizeArguments(cmdLineArgs) if x.split("=")[0] in accessibilityArguments]
+    if not any(x.startswith("--tIntLenMax=") for x in args):
+        args.append("--tIntLenMax=%s" % maxInteractionLength)
+    return sorted(args)
+
+
+# Cache key of the ED-values of a target file (with the content of the files named by the arguments, e.g. an
+# energy parameter file edited in place)
+def edKey(binaryId, targetFile, edArgs):
+    sha = hashlib.sha256()
+    sha.update(binaryId.encode("utf-8"))
+    sha.update("\0".join(edArgs).encode("utf-8"))
+    for option, _, value in [x.partition("=") for x in edArgs]:
+        if option in fileArguments and os.path.isfile(value):
+            sha.update(b"\0" + fileChecksum(value).encode("utf-8"))
+    sha.update(b"\0" + inputChecksum(targetFile).encode("utf-8"))
+    return sha.hexdigest()
+
+
+# Location of the compressed ED file of a target within the ED folder
+def edArchive(edFolder, organism, targetName, key):
+    return os.path.join(edFolder, organism, targetName, key + ".ed.gz")
+
+
+# Compute the ED-values of a target file into the archive, unless another run already did.
+# The computation holds a lock per archive, so concurrent callIDs compute each ED file only once.
+def precomputeED(intaRNAbinary, targetFile, archive, edArgs, threads):
+    os.makedirs(os.path.dirname(archive), exist_ok=True)
+    with open(archive + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(archive):
+            return
+        tmpFile = archive[:-len(".gz")] + ".tmp%d" % os.getpid()
+        callArgs = [intaRNAbinary, "-q", "AAAAAAAA", "-t", targetFile, "--noSeed", "-n", "0",
+                    "--out=/dev/null", "--out=tAcc:" + tmpFile] + edArgs
+        if threads is not None:
+            callArgs.append("--threads=%s" % threads)
+        try:
+            check_output(callArgs, stderr=STDOUT)
+        except CalledProcessError as e:
+            print("calling " + (" ".join(e.cmd)) + " produced error code " + str(e.returncode) + " and output " + str(e.output))
+            raise
+        # compress and publish atomically
+        with open(tmpFile, "rb") as plain, gzip.open(tmpFile + ".gz", "wb") as packed:
+            shutil.copyfileobj(plain, packed)
+        os.remove(tmpFile)
+        os.replace(tmpFile + ".gz", archive)
+
+
+# Unpack a compressed ED file to the location used by the IntaRNA calls of a callID
+def unpackED(archive, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with gzip.open(archive, "rb") as packed, open(destination + ".tmp", "wb") as plain:
+        shutil.copyfileobj(packed, plain)
+    os.replace(destination + ".tmp", destination)
+
+
+# Make the ED file of one target available: compute it if it is not cached and unpack it
+# edJob: tuple (target file, archive, unpacked destination)
+def provideED(intaRNAbinary, edArgs, threads, edJob):
+    targetFile, archive, destination = edJob
+    precomputeED(intaRNAbinary, targetFile, archive, edArgs, threads)
+    unpackED(archive, destination)
+    return destination
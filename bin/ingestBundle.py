@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import json
+import shutil
+
+from jobBundle import loadTasks, recordPath
+from jobManifest import loadManifest, createManifest, registerJobs, updateJob, jobStats, allDone, fileChecksum
+from calls import writeTables, capOutput
+from benchmark import benchmarkCallID, readVerifiedInteractions
+from rankSidecar import updateSidecar
+
+########################################################################################################################
+#                                                                                                                      #
+#          Collect the outputs and resource records of a job bundle (calls.py --bundle) into a callID folder.          #
+#             The callID folder is equal to one created by calls.py: outputs, logs, manifest, time/memory tables,       #
+#                                            calls.txt and the benchmark.                                              #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Collect the results of a bundle into a new callID folder within outputPath and run benchmark.py (if benchmark is set)
+# return: the callID of the bundle
+def ingestBundle(bundleFolder, outputPath, verified_interactions, benchmark=True):
+    bundleFolder = os.path.abspath(bundleFolder)
+    bundleManifest = loadManifest(bundleFolder)
+
+    settings = bundleManifest["settings"]
+    callID = settings["callID"]
+    callFolder = os.path.join(outputPath, callID)
+    if os.path.exists(callFolder):
+        sys.exit("Error!!! A directory for callID %s already exists!" % callID)
+    os.makedirs(callFolder)
+
+    # Copy the outputs into the callID folder
+    jobs = []
+    for task in loadTasks(bundleFolder):
+        job = dict(task, out=os.path.join(callFolder, task["out"]), partOut=os.path.join(callFolder, task["partOut"]))
+        if os.path.exists(os.path.join(bundleFolder, task["partOut"])):
+            os.makedirs(os.path.dirname(job["partOut"]), exist_ok=True)
+            shutil.copyfile(os.path.join(bundleFolder, task["partOut"]), job["partOut"])
+        job["record"] = recordPath(bundleFolder, task["key"])
+        jobs.append(job)
+
+    if os.path.exists(os.path.join(bundleFolder, "logs")):
+        shutil.copytree(os.path.join(bundleFolder, "logs"), os.path.join(callFolder, "logs"))
+
+    # The manifest of the callID is built from the resource records of the tasks
+    manifest = createManifest(callFolder, settings)
+    registerJobs(manifest, jobs)
+    for job in jobs:
+        if not os.path.exists(job["record"]):
+            continue
+        with open(job["record"]) as f:
+            record = json.load(f)
+        checksum = record.pop("checksum", None)
+        if record["exitCode"] == 0 and checksum is not None and fileChecksum(job["partOut"]) == checksum:
+            updateJob(manifest, job["key"], state="done", resources=record, checksum=checksum)
+        else:
+            updateJob(manifest, job["key"], state="failed", resources=record)
+
+    nDone = sum(1 for job in jobs if manifest["jobs"][job["key"]]["state"] == "done")
+    print("Ingested %d of %d tasks of %s!" % (nDone, len(jobs), callID))
+
+    # outputs of a capped callID (calls.py --topK) are truncated once they are final, then their sidecar is written
+    verified = readVerifiedInteractions(verified_interactions) if settings.get("topK", 0) > 0 else None
+    def finalizeOutput(job):
+        if verified is not None:
+            capOutput(manifest, job, settings["topK"], verified)
+        updateSidecar(job["out"])
+    writeTables(callID, callFolder, jobs, [jobStats(manifest, job["key"]) for job in jobs], manifest, onOutput=finalizeOutput)
+
+    # Shard outputs are merged, remaining shard outputs are kept if tasks failed
+    if os.path.exists(os.path.join(callFolder, "shards")) and allDone(manifest, [job["key"] for job in jobs]):
+        shutil.rmtree(os.path.join(callFolder, "shards"))
+
+    if benchmark:
+        benchmarkCallID(callID, verified_interactions, outputPath)
+    return callID
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Ingest the results of a job bundle created with calls.py --bundle.")
+    parser.add_argument("-b", "--bundle", action="store", dest="bundleFolder", required=True
+                        , help="the bundle folder.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder, the callID folder is created inside. Default: ./output")
+    parser.add_argument("-v", "--verified", action="store", dest="verified_interactions", default="./verified_interactions.csv"
+                        , help="The path to the file containing the verified interactions.")
+    parser.add_argument("-n", "--noBenchmark", action="store_true", dest="noBenchmark", default=False
+                        , help="do not run benchmark.py for the ingested callID.")
+    args = parser.parse_args()
+
+    if loadManifest(os.path.abspath(args.bundleFolder)) is None:
+        sys.exit("Error!!! %s is not a job bundle!" % args.bundleFolder)
+
+    ingestBundle(args.bundleFolder, args.outputPath, args.verified_interactions, benchmark=not args.noBenchmark)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+import sys
+import os
+import glob
+import gzip
+import numpy as np
+import pandas as pd
+
+# zstd compression is optional, it needs the zstandard module
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# the pyarrow csv engine is optional, pandas' own parser is used without it
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+########################################################################################################################
+#                                                                                                                      #
+#                   Storage of the IntaRNA output files of a callID, either plain or compressed (gzip/zstd).           #
+#          The compression is given by the file ending (.csv, .csv.gz, .csv.zst), readers open all of them alike.      #
+#                                                                                                                      #
+########################################################################################################################
+
+# File ending of each supported compression
+compressionEndings = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Tables of calls.py and benchmark.py within a callID folder that are not IntaRNA outputs
+tableFileNames = ["runTime.csv", "memoryUsage.csv", "benchmark.csv", "stragglers.csv"]
+
+# Types of the columns of an IntaRNA output (the columns written by calls.py)
+outputColumnTypes = {"id1": str, "start1": "int64", "end1": "int64", "id2": str, "start2": "int64", "end2": "int64",
+                     "subseqDP": str, "hybridDP": str, "E": "float64"}
+
+
+# Exit if the given compression can not be used
+def checkCompression(compression):
+    if compression not in compressionEndings:
+        sys.exit("Error!!! Unknown compression %s, use one of: %s" % (compression, ", ".join(compressionEndings)))
+    if compression == "zstd" and zstandard is None:
+        sys.exit("Error!!! zstd compression needs the python module zstandard (pip install zstandard)!")
+
+
+# The compression of an output file, derived from its ending
+def compressionOf(path):
+    for compression, ending in compressionEndings.items():
+        if ending != "" and path.endswith(".csv" + ending):
+            return compression
+    return "none"
+
+
+# The name of an output file with the given compression
+def outputName(path, compression):
+    return path + compressionEndings[compression]
+
+
+# The name of an output file without the .csv and compression ending (e.g. to name its logs)
+def outputStem(path):
+    path = path[:len(path) - len(compressionEndings[compressionOf(path)])]
+    return os.path.splitext(path)[0]
+
+
+# Open an output file for reading or writing (binary or text mode), the compression is derived from the file ending
+# unless it is given
+def openOutput(path, mode="rt", compression=None):
+    if compression is None:
+        compression = compressionOf(path)
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "zstd":
+        checkCompression(compression)
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+
+# All IntaRNA output files of a callID folder (plain and compressed), sorted by name
+def outputFiles(callFolder):
+    files = []
+    for ending in compressionEndings.values():
+        files.extend(glob.glob(os.path.join(callFolder, "*.csv" + ending)))
+    return sorted(x for x in files if os.path.basename(x) not in tableFileNames)
+
+
+# Read only the given columns of an IntaRNA output (plain or compressed) with fixed types, the parser skips all other
+# columns (e.g. the long subseqDP/hybridDP strings). Plain outputs are memory mapped.
+# nrows: read only the first rows (None for all), the rest of the file is not parsed
+# topK: keep only the rows of the K lowest energy classes (needs column E, see energyClassThreshold)
+# return: DataFrame of the columns
+def readOutput(path, columns, nrows=None, topK=None):
+    options = {"sep": ";", "header": 0, "usecols": columns, "nrows": nrows,
+               "dtype": dict((x, outputColumnTypes[x]) for x in columns if x in outputColumnTypes)}
+    # the pyarrow engine parses in parallel, but it can not stop after some rows
+    if pyarrow is not None and nrows is None:
+        options["engine"] = "pyarrow"
+    compression = compressionOf(path)
+    if compression == "none":
+        df = pd.read_csv(path, memory_map=options.get("engine") != "pyarrow", **options)
+    else:
+        with openOutput(path, "rb", compression) as f:
+            df = pd.read_csv(f, **options)
+    if topK is not None:
+        energies = df["E"].round(2).to_numpy()
+        threshold = energyClassThreshold(energies, topK)
+        if threshold is not None:
+            df = df[energies <= threshold]
+    return df
+
+
+# The K-th lowest energy class (distinct energy) of the given rounded energies, None if there are at most K classes.
+# The threshold is found by partial selection instead of sorting all energies: the m lowest energies are selected
+# (np.partition) and m is doubled until they hold K classes.
+def energyClassThreshold(energies, k):
+    m = k
+    while m < len(energies):
+        selected = energies[energies <= np.partition(energies, m - 1)[m - 1]]
+        classes = np.unique(selected)
+        if len(classes) >= k:
+            return classes[k - 1] if len(classes) > k or len(selected) < len(energies) else None
+        m *= 2
+    classes = np.unique(energies)
+    return classes[k - 1] if len(classes) > k else None
+
+
+# Truncate an IntaRNA output to the interactions of its top K energy classes (distinct energies rounded to two
+# decimals, as ranked by benchmark.py) and all interactions of the targets in keepTargets.
+# The kept lines are copied unchanged, the file is replaced atomically.
+# return: True if interactions were removed
+def truncateOutput(path, k, keepTargets=()):
+    df = readOutput(path, ["id1", "E"])
+    energies = df["E"].round(2).to_numpy()
+    threshold = energyClassThreshold(energies, k)
+    if threshold is None:
+        return False
+    keep = (energies <= threshold) | df["id1"].isin(set(keepTargets)).to_numpy()
+    compression = compressionOf(path)
+    with openOutput(path, "rt", compression) as f, openOutput(path + ".tmp", "wt", compression) as out:
+        out.write(f.readline())
+        for line, kept in zip(f, keep):
+            if kept:
+                out.write(line)
+    os.replace(path + ".tmp", path)
+    return True
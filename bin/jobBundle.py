@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import json
+import shlex
+import stat
+
+from jobExecutor import runWithLimits
+from jobManifest import fileChecksum
+from intarnaOutput import outputStem
+
+########################################################################################################################
+#                                                                                                                      #
+#            Portable job bundles of calls.py (--bundle) for batch systems: SGE array jobs or xargs/GNU parallel.      #
+#        Each task runs one IntaRNA call and stores its output, logs and resource usage within the bundle folder.      #
+#                  Called as script, a single task of a bundle is run (used by the task.sh wrapper).                   #
+#                                                                                                                      #
+########################################################################################################################
+
+tasksFileName = "tasks.json"
+
+
+# Make a file executable for everybody allowed to read it
+def makeExecutable(path):
+    mode = os.stat(path).st_mode
+    os.chmod(path, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+# Location of the resource record of a task within the bundle
+def recordPath(bundleFolder, key):
+    return os.path.join(bundleFolder, "records", outputStem(key) + ".json")
+
+
+# Write the task list and the runner scripts of a bundle.
+# jobs are the prepared calls of calls.py (absolute paths), threads the IntaRNA threads of each call,
+# limits the wall time, memory and retry limits of each call (see runWithLimits).
+def writeBundle(bundleFolder, callID, jobs, threads, limits=None):
+    binFolder = os.path.dirname(os.path.abspath(__file__))
+    tasks = [{key: job[key] for key in ["key", "organism", "target_name", "srna_name", "query", "target", "call", "log",
+                                           "stream"]}
+             for job in jobs]
+    for task, job in zip(tasks, jobs):
+        task["limits"] = limits if limits is not None else dict()
+        task["out"] = os.path.relpath(job["out"], bundleFolder)
+        task["partOut"] = os.path.relpath(job["partOut"], bundleFolder)
+    with open(os.path.join(bundleFolder, tasksFileName), "w") as f:
+        json.dump(tasks, f, indent=1)
+
+    taskScript = os.path.join(bundleFolder, "task.sh")
+    with open(taskScript, "w") as f:
+        f.write("#!/bin/bash\n"
+                "# Run one task of the bundle: task.sh <task index> (1-based, default: $SGE_TASK_ID)\n"
+                "python3 %s -b %s -t \"${1:-$SGE_TASK_ID}\"\n"
+                % (shlex.quote(os.path.join(binFolder, "jobBundle.py")), shlex.quote(bundleFolder)))
+    makeExecutable(taskScript)
+
+    os.makedirs(os.path.join(bundleFolder, "logs"), exist_ok=True)
+    arrayScript = os.path.join(bundleFolder, "array.sge")
+    with open(arrayScript, "w") as f:
+        f.write("#!/bin/bash\n"
+                "#$ -N intaRNA-%s\n"
+                "#$ -cwd\n"
+                "#$ -t 1-%d\n"
+                "#$ -pe smp %d\n"
+                "#$ -o %s\n"
+                "#$ -j y\n"
+                "\n"
+                "# Submit with: qsub array.sge, collect the results afterwards with ingestBundle.py\n"
+                "%s \"$SGE_TASK_ID\"\n"
+                % (callID, len(tasks), threads, shlex.quote(os.path.join(bundleFolder, "logs")), shlex.quote(taskScript)))
+
+    localScript = os.path.join(bundleFolder, "run_local.sh")
+    with open(localScript, "w") as f:
+        f.write("#!/bin/bash\n"
+                "# Run all tasks of the bundle on one machine: run_local.sh [number of parallel tasks]\n"
+                "# With GNU parallel: seq 1 %d | parallel -j <number of parallel tasks> %s {}\n"
+                "seq 1 %d | xargs -P \"${1:-1}\" -n 1 %s\n"
+                % (len(tasks), shlex.quote(taskScript), len(tasks), shlex.quote(taskScript)))
+    makeExecutable(localScript)
+
+
+# Read the task list of a bundle
+def loadTasks(bundleFolder):
+    with open(os.path.join(bundleFolder, tasksFileName)) as f:
+        return json.load(f)
+
+
+# Run a single task of a bundle and store its resource record (including exit code and output checksum)
+# return: resource record of the call
+def runTask(bundleFolder, index):
+    task = loadTasks(bundleFolder)[index - 1]
+    try:
+        record = runWithLimits(task.get("limits", dict()), shlex.split(task["call"], posix=False), task["log"],
+                               task.get("stream"))
+    except Exception as e:
+        record = getattr(e, "record", None) or {"exitCode": -1}
+    record["checksum"] = fileChecksum(os.path.join(bundleFolder, task["partOut"]))
+
+    path = recordPath(bundleFolder, task["key"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(record, f)
+    os.replace(path + ".tmp", path)
+    return record
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run a single task of a job bundle created with calls.py --bundle.")
+    parser.add_argument("-b", "--bundle", action="store", dest="bundleFolder", required=True
+                        , help="the bundle folder.")
+    parser.add_argument("-t", "--task", action="store", dest="task", type=int, required=True
+                        , help="the (1-based) index of the task to run.")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.bundleFolder, tasksFileName)):
+        sys.exit("Error!!! %s is not a job bundle!" % args.bundleFolder)
+
+    sys.exit(runTask(os.path.abspath(args.bundleFolder), args.task)["exitCode"])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
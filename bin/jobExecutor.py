@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import os
+import time
+import signal
+import shutil
+import threading
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor, Future
+from subprocess import Popen
+from subprocess import DEVNULL
+from subprocess import PIPE
+from subprocess import CalledProcessError
+
+from intarnaOutput import openOutput, compressionOf
+
+########################################################################################################################
+#                                                                                                                      #
+#                     Execution of IntaRNA calls, either one after another or concurrently.                            #
+#             Each call is a separate process, the pool only waits for them, so N workers keep N cores busy.           #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Run a subprocess with the given call and provide process statistics.
+# The resource usage is taken from wait4 (rusage of the child), stdout and stderr of the child are streamed into
+# logPrefix.out and logPrefix.err (discarded if no logPrefix is given).
+# If outputFile is given, stdout of the child is streamed into this file instead (compressed according to its ending),
+# the file is only published if the call succeeded.
+# limits (optional): dictionary with the wall time in seconds ("wallTime") and address space in bytes ("memory")
+# granted to the call, 0/None for no limit. A call exceeding its wall time is killed.
+# return: dictionary with the resource usage of the call, raises CalledProcessError (with the record attached)
+#         if the call failed. The record of a failed call is classified as "timeout", "oom" or "crash" (key "failure").
+def runSubprocess(callArgs, logPrefix=None, outputFile=None, limits=None):
+    limits = limits if limits is not None else dict()
+    if logPrefix is not None:
+        os.makedirs(os.path.dirname(logPrefix), exist_ok=True)
+        stdout, stderr = open(logPrefix + ".out", "wb"), open(logPrefix + ".err", "wb")
+    else:
+        stdout, stderr = DEVNULL, DEVNULL
+
+    try:
+        start = time.monotonic()
+        # the address space is limited by a shell that sets the limit and execs the call (preexec_fn is not safe with
+        # the worker threads), so the limit holds from the first allocation on
+        process = Popen(limitedCall(callArgs, limits.get("memory")), stdout=stdout if outputFile is None else PIPE,
+                        stderr=stderr)
+        timer = None
+        timedOut = threading.Event()
+        if limits.get("wallTime"):
+            timer = threading.Timer(limits["wallTime"], lambda: (timedOut.set(), process.kill()))
+            timer.daemon = True
+            timer.start()
+        try:
+            if outputFile is not None:
+                with openOutput(outputFile + ".tmp", "wb", compressionOf(outputFile)) as out:
+                    shutil.copyfileobj(process.stdout, out, 1 << 20)
+        finally:
+            if outputFile is not None:
+                process.stdout.close()
+            # wait for call to finish and get statistics
+            _, status, usage = os.wait4(process.pid, 0)
+            if timer is not None:
+                timer.cancel()
+        wall = time.monotonic() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        if logPrefix is not None:
+            stdout.close()
+            stderr.close()
+
+    if outputFile is not None:
+        if process.returncode == 0:
+            os.replace(outputFile + ".tmp", outputFile)
+        elif os.path.exists(outputFile + ".tmp"):
+            os.remove(outputFile + ".tmp")
+
+    record = {"exitCode": process.returncode,
+              "wallTime": round(wall, 3),
+              "userTime": round(usage.ru_utime, 3),
+              "systemTime": round(usage.ru_stime, 3),
+              "maxRSS": usage.ru_maxrss,
+              "minorPageFaults": usage.ru_minflt,
+              "majorPageFaults": usage.ru_majflt,
+              "voluntaryContextSwitches": usage.ru_nvcsw,
+              "involuntaryContextSwitches": usage.ru_nivcsw,
+              "readBytes": usage.ru_inblock * 512,
+              "writtenBytes": usage.ru_oublock * 512}
+
+    if process.returncode != 0:
+        record["failure"] = classifyFailure(record, timedOut.is_set(), limits.get("memory"), logPrefix)
+        print("calling " + (" ".join(callArgs)) + " produced error code " + str(process.returncode)
+              + " (" + record["failure"] + ")"
+              + (" (see %s.err)" % logPrefix if logPrefix is not None else ""))
+        error = CalledProcessError(process.returncode, callArgs)
+        error.record = record
+        raise error
+    return record
+
+
+# The call with its address space limited to the given number of bytes (unchanged without limit)
+def limitedCall(callArgs, memoryLimit):
+    if not memoryLimit:
+        return callArgs
+    return ["sh", "-c", 'ulimit -v %d && exec "$@"' % (int(memoryLimit) // 1024), "sh"] + list(callArgs)
+
+
+# Messages of failed allocations in the stderr of a call (lower case)
+allocationErrors = ["std::bad_alloc", "cannot allocate memory", "out of memory", "memory allocation failed", "memoryerror"]
+
+
+# Classify a failed call: "timeout" (killed after its wall time), "oom" (killed by the OOM killer with a memory limit
+# or a peak memory close to the physical memory, or out of its address space limit: a failed allocation, abort or a
+# peak memory close to the limit) or "crash" (any other error, e.g. a kill by the queueing system)
+def classifyFailure(record, timedOut, memoryLimit, logPrefix):
+    if timedOut:
+        return "timeout"
+    if record["exitCode"] == -signal.SIGKILL:
+        physicalMemory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        return "oom" if memoryLimit or record["maxRSS"] * 1024 >= 0.9 * physicalMemory else "crash"
+    if memoryLimit:
+        errors = ""
+        if logPrefix is not None and os.path.exists(logPrefix + ".err"):
+            with open(logPrefix + ".err", "rb") as f:
+                f.seek(max(0, os.path.getsize(logPrefix + ".err") - 4096))
+                errors = str(f.read(), "utf-8", "replace").lower()
+        if record["exitCode"] == -signal.SIGABRT or any(x in errors for x in allocationErrors) \
+                or record["maxRSS"] * 1024 >= 0.9 * memoryLimit:
+            return "oom"
+    return "crash"
+
+
+# Run a call within the given limits (see runSubprocess) and retry it if it failed.
+# limits may also hold the number of retries ("retries"), the delay before the first retry in seconds ("retryDelay",
+# doubled for each further retry) and the factor the memory limit is raised by after an "oom" ("memoryFactor").
+# Calls that ran into their wall time are not retried, they would only time out again.
+# return: resource record of the last attempt (with the number of attempts), raises CalledProcessError as runSubprocess
+def runWithLimits(limits, callArgs, logPrefix=None, outputFile=None):
+    attemptLimits = dict(limits)
+    attempt = 1
+    while True:
+        try:
+            record = runSubprocess(callArgs, logPrefix, outputFile, attemptLimits)
+            record["attempts"] = attempt
+            return record
+        except CalledProcessError as e:
+            e.record["attempts"] = attempt
+            if attempt > limits.get("retries", 0) or e.record["failure"] == "timeout":
+                raise
+            if e.record["failure"] == "oom" and attemptLimits.get("memory"):
+                attemptLimits["memory"] = attemptLimits["memory"] * limits.get("memoryFactor", 2.0)
+            delay = limits.get("retryDelay", 0) * 2 ** (attempt - 1)
+            print("Retrying in %.1fs (attempt %d of %d)%s" % (delay, attempt + 1, limits.get("retries", 0) + 1,
+                  " with a memory limit of %.1f GB" % (attemptLimits["memory"] / 1024 ** 3)
+                  if e.record["failure"] == "oom" and attemptLimits.get("memory") else ""))
+            time.sleep(delay)
+            attempt += 1
+
+
+# The number of cores granted to this run.
+# SGE exports NSLOTS for parallel environments (-pe smp N), otherwise the cpu affinity of the process is used.
+def availableCores():
+    if os.environ.get("NSLOTS", "").isdigit():
+        return max(1, int(os.environ["NSLOTS"]))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Extract the value of the IntaRNA --threads argument from the command line arguments (None if not set)
+def userThreads(cmdLineArgs):
+    if "threads " in cmdLineArgs:
+        return cmdLineArgs.split("threads ")[-1].split(" ")[0]
+    elif "threads=" in cmdLineArgs:
+        return cmdLineArgs.split("threads=")[-1].split(" ")[0]
+    return None
+
+
+# Divide the core budget between concurrent IntaRNA processes and the threads of each IntaRNA process.
+# If the user already set --threads for IntaRNA it is respected and only the number of processes is adapted.
+# return: number of concurrent processes, threads per process (None if IntaRNA arguments are not to be changed)
+def splitCoreBudget(cores, jobs, nCalls, cmdLineArgs):
+    jobs = max(1, min(jobs, nCalls))
+    threads = userThreads(cmdLineArgs)
+    if threads is not None:
+        if threads.isdigit() and int(threads) > 0:
+            jobs = max(1, min(jobs, cores // int(threads)))
+        return jobs, None
+    return jobs, max(1, cores // jobs)
+
+
+# Run all given calls with at most nJobs concurrent processes.
+# The results of runner are yielded in the order of the given calls, independent of the order of completion.
+def runJobs(calls, nJobs, runner=runSubprocess):
+    if nJobs <= 1:
+        for call in calls:
+            yield runner(call)
+        return
+
+    with ThreadPoolExecutor(max_workers=nJobs) as pool:
+        for result in pool.map(runner, calls):
+            yield result
+
+
+# Run all given jobs with at most nJobs concurrent processes, admitting a job only while the predicted peak memory
+# of all running jobs stays within memoryBudget. Jobs are admitted in their given order, a job predicted to need more
+# than the whole budget runs alone. observe(job, result) is called for each finished job before its memory is released.
+# The results of runner are yielded in the order of the given jobs.
+def runJobsWithinMemory(jobs, nJobs, memoryBudget, predict, observe, runner):
+    condition = threading.Condition()
+    state = {"reserved": 0, "running": 0, "stopped": False}
+    futures = Queue()
+    pool = ThreadPoolExecutor(max_workers=max(1, nJobs))
+
+    def run(job, reservation):
+        result = None
+        try:
+            result = runner(job)
+            return result
+        finally:
+            # the reservation is released even if observe fails
+            try:
+                observe(job, result)
+            finally:
+                with condition:
+                    state["reserved"] -= reservation
+                    state["running"] -= 1
+                    condition.notify_all()
+
+    def fits(job):
+        return state["running"] == 0 or (state["running"] < nJobs
+                                         and state["reserved"] + min(predict(job), memoryBudget) <= memoryBudget)
+
+    # an error of the admission (e.g. of predict) stops it and is raised to the caller by a failed future,
+    # the admission also stops when the caller stops consuming the results
+    def admit():
+        try:
+            for job in jobs:
+                with condition:
+                    condition.wait_for(lambda: state["stopped"] or fits(job))
+                    if state["stopped"]:
+                        return
+                    reservation = min(predict(job), memoryBudget)
+                    state["reserved"] += reservation
+                    state["running"] += 1
+                    futures.put(pool.submit(run, job, reservation))
+        except BaseException as error:
+            failed = Future()
+            failed.set_exception(error)
+            futures.put(failed)
+
+    admission = threading.Thread(target=admit, daemon=True)
+    admission.start()
+    try:
+        for _ in jobs:
+            yield futures.get().result()
+    finally:
+        with condition:
+            state["stopped"] = True
+            condition.notify_all()
+        admission.join()
+        pool.shutdown(wait=True)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import hashlib
+import threading
+
+from runJournal import openJournal, appendJournal, flushJournal, readJournal
+
+########################################################################################################################
+#                                                                                                                      #
+#                  Job manifest of a callID, recording the state of each query-target call of calls.py.                #
+#       States: pending, running, done, failed. Finished calls store their resource usage and an output checksum,     #
+#                          which allows resuming an interrupted callID with only the missing calls.                    #
+#       Every registration and state change is also appended to the run journal. While jobs report their states,       #
+#      the manifest is saved at most every few seconds, loading it replays the journal entries after its last save.    #
+#                                                                                                                      #
+########################################################################################################################
+
+manifestFileName = "manifest.json"
+
+# Guards the manifest dictionary and file, jobs report their state from concurrent worker threads
+manifestLock = threading.Lock()
+
+# Seconds between two saves of the manifest while jobs report their states (the journal holds the changes in between),
+# so a run writes the manifest a bounded number of times instead of once per state change
+manifestSaveInterval = 2.0
+
+
+# Compute the sha256 checksum of a file (None if it does not exist)
+def fileChecksum(path):
+    if not os.path.exists(path):
+        return None
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# Create a new manifest for the given callID folder and settings
+def createManifest(callFolder, settings):
+    manifest = {"path": os.path.join(callFolder, manifestFileName), "journal": openJournal(callFolder),
+                "settings": settings, "jobs": dict(), "outputs": dict()}
+    saveManifest(manifest)
+    return manifest
+
+
+# Load the manifest of the given callID folder (None if there is none).
+# The state changes and output checksums journaled after the last save of the manifest are applied.
+def loadManifest(callFolder):
+    path = os.path.join(callFolder, manifestFileName)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["path"] = path
+    manifest["journal"] = openJournal(callFolder)
+    manifest["lastSave"] = time.monotonic()
+    # manifests written before the journal offset was recorded are complete
+    if manifest.get("journalOffset") is not None:
+        for entry in readJournal(manifest["journal"]["path"], manifest["journalOffset"]):
+            if entry["event"] == "job":
+                manifest["jobs"].setdefault(entry["key"], {"state": "pending"}).update(
+                    (x, y) for x, y in entry.items() if x not in ["event", "key", "time", "reused"])
+            elif entry["event"] == "output":
+                manifest["outputs"][entry["key"]] = entry["checksum"]
+    return manifest
+
+
+# Write the manifest atomically, a killed run never leaves a truncated manifest behind.
+# The journal is committed first, the manifest records up to which offset the journal is contained in it.
+def saveManifest(manifest):
+    flushJournal(manifest["journal"])
+    path = manifest["journal"]["path"]
+    manifest["journalOffset"] = os.path.getsize(path) if os.path.exists(path) else 0
+    content = {key: value for key, value in manifest.items() if key not in ["path", "journal", "lastSave", "dirty"]}
+    with open(manifest["path"] + ".tmp", "w") as f:
+        json.dump(content, f, indent=1, sort_keys=True)
+    os.replace(manifest["path"] + ".tmp", manifest["path"])
+    manifest["lastSave"] = time.monotonic()
+    manifest["dirty"] = False
+
+
+# Save a changed manifest if its last save is longer ago than manifestSaveInterval (the manifest lock has to be held)
+def saveIfDue(manifest):
+    manifest["dirty"] = True
+    if time.monotonic() - manifest.get("lastSave", 0) >= manifestSaveInterval:
+        saveManifest(manifest)
+
+
+# Save the manifest if it changed since its last save (e.g. at the end of a run)
+def flushManifest(manifest):
+    with manifestLock:
+        if manifest.get("dirty"):
+            saveManifest(manifest)
+
+
+# Set fields of a job entry (creating it if needed), the change is journaled and the manifest saved when due
+def updateJob(manifest, key, **fields):
+    with manifestLock:
+        manifest["jobs"].setdefault(key, {"state": "pending"}).update(fields)
+        saveIfDue(manifest)
+    appendJournal(manifest["journal"], [dict(fields, event="job", key=key)])
+
+
+# Record the checksum of a final output file (e.g. merged shard outputs), it is journaled and saved when due
+def recordOutput(manifest, key, path):
+    checksum = fileChecksum(path)
+    with manifestLock:
+        manifest["outputs"][key] = checksum
+        saveIfDue(manifest)
+    appendJournal(manifest["journal"], [{"event": "output", "key": key, "checksum": checksum}])
+
+
+# Register all jobs of a run, jobs that are not complete are (re)set to pending.
+# Complete jobs are journaled as done again, so the journal of a resumed callID holds all calls.
+# return: dictionary job key -> True if the job does not have to be run again
+def registerJobs(manifest, jobs):
+    complete = dict()
+    entries = []
+    with manifestLock:
+        for job in jobs:
+            entry = manifest["jobs"].get(job["key"], dict())
+            complete[job["key"]] = isComplete(manifest, job, entry)
+            if not complete[job["key"]]:
+                entry = {"state": "pending"}
+            entry.update({"organism": job["organism"], "target_name": job["target_name"], "srna_name": job["srna_name"],
+                          "call": job["call"]})
+            manifest["jobs"][job["key"]] = entry
+            entries.append({"event": "register", "key": job["key"], "organism": job["organism"],
+                            "target_name": job["target_name"], "srna_name": job["srna_name"], "call": job["call"]})
+            if complete[job["key"]]:
+                entries.append({"event": "job", "key": job["key"], "state": "done", "resources": entry.get("resources"),
+                                "checksum": entry.get("checksum"), "reused": True})
+        saveManifest(manifest)
+    appendJournal(manifest["journal"], entries)
+    return complete
+
+
+# A job is complete if it finished and its output is still intact. This is either its own output file,
+# or (for shards that were already merged) the final output file recorded in the manifest.
+def isComplete(manifest, job, entry):
+    if entry.get("state") != "done":
+        return False
+    if entry.get("checksum") is not None and fileChecksum(job["partOut"]) == entry["checksum"]:
+        return True
+    outKey = os.path.basename(job["out"])
+    return job["partOut"] != job["out"] and manifest["outputs"].get(outKey) is not None \
+        and fileChecksum(job["out"]) == manifest["outputs"][outKey]
+
+
+# Run a job with the given runner and track its state in the manifest.
+# Failed jobs are marked as failed and do not stop the remaining jobs.
+# onDone (optional) is called with the job and its resource record after a successful run.
+# The stdout of jobs with a "stream" file is streamed into this (compressed) output file.
+# return: resource record of the job (None if it failed)
+def runTrackedJob(manifest, runner, job, onDone=None):
+    updateJob(manifest, job["key"], state="running")
+    try:
+        record = runner(job["callArgs"], job["log"], job.get("stream"))
+    except Exception as e:
+        print("Job %s failed: %s" % (job["key"], e))
+        updateJob(manifest, job["key"], state="failed", resources=getattr(e, "record", None))
+        return None
+    updateJob(manifest, job["key"], state="done", resources=record, checksum=fileChecksum(job["partOut"]))
+    if onDone is not None:
+        onDone(job, record)
+    return record
+
+
+# The runtime (user time in seconds) and memory usage (max RSS in kilobytes) of a job ("NA" unless it finished)
+def jobStats(manifest, key):
+    entry = manifest["jobs"][key]
+    if entry["state"] != "done" or entry.get("resources") is None:
+        return "NA", "NA"
+    return "%.2f" % entry["resources"]["userTime"], str(entry["resources"]["maxRSS"])
+
+
+# Report the stragglers of a run together with their inputs, so they can be profiled: finished jobs whose wall time
+# exceeds factor times the median wall time of all finished jobs, and jobs that ran into their wall time limit.
+# return: number of reported jobs (the report is removed if there are none)
+def writeStragglerReport(path, jobs, manifest, factor):
+    entries = [(job, manifest["jobs"][job["key"]]) for job in jobs]
+    wallTimes = sorted(entry["resources"]["wallTime"] for _, entry in entries
+                       if entry["state"] == "done" and entry.get("resources") is not None)
+    median = wallTimes[len(wallTimes) // 2] if wallTimes != [] else 0
+    stragglers = [(job, entry) for job, entry in entries if entry.get("resources") is not None
+                  and ((entry["state"] == "done" and wallTimes != [] and entry["resources"]["wallTime"] > factor * median)
+                       or entry["resources"].get("failure") == "timeout")]
+
+    if stragglers == []:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    with open(path, "w") as f:
+        print("key;query;target;state;failure;wallTime;userTime;maxRSS;attempts;call", file=f)
+        for job, entry in sorted(stragglers, key=lambda x: -x[1]["resources"]["wallTime"]):
+            resources = entry["resources"]
+            print("%s;%s;%s;%s;%s;%.2f;%.2f;%s;%s;%s" % (job["key"], job["query"], job["target"], entry["state"],
+                                                       resources.get("failure", ""), resources["wallTime"],
+                                                       resources["userTime"], resources["maxRSS"],
+                                                       resources.get("attempts", 1), job["call"]), file=f)
+    return len(stragglers)
+
+
+# Number of failed jobs per failure class (timeout, oom, crash)
+def failureCounts(manifest, keys):
+    counts = dict()
+    for key in keys:
+        entry = manifest["jobs"][key]
+        if entry["state"] == "failed":
+            failure = (entry.get("resources") or dict()).get("failure", "crash")
+            counts[failure] = counts.get(failure, 0) + 1
+    return counts
+
+
+# Whether all given jobs finished successfully
+def allDone(manifest, keys):
+    return all(manifest["jobs"][key]["state"] == "done" for key in keys)
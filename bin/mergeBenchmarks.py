@@ -2,34 +2,41 @@
 # Author: Rick Gelhausen
 import sys, argparse
 import os.path
-import glob
 import pandas as pd
 
+from resultCatalog import catalogCallIDs
+from rankStore import readBenchmark, rankMatrix, openStore, addCallID, readRanks, readResources, resourceTables
+
 ########################################################################################################################
 #                                                                                                                      #
 #                              Merge benchmark csv files ending in _benchmark.csv                                      #
 #                               Also merges the according memory and time files                                        #
 #                                        Merge all or specific callIDs                                                 #
+#                   With a rank store the callIDs are added to it incrementally and merged from the store              #
 #                                                                                                                      #
 ########################################################################################################################
 
-# This method assumes an equal setup of all benchmark files
+# This method assumes an equal setup of all benchmark files.
+# All files are joined at once on their verified interactions, the rank columns are ordered by callID.
 def mergeBenchmarks(benchList, outputPath):
-    resultBenchDF = pd.read_csv(benchList[0], sep=";", header=0)
-    for bench in benchList[1:]:
-        nextbench = pd.read_csv(bench, sep=";", header=0)
-        resultBenchDF = pd.merge(resultBenchDF, nextbench)
-
-    # Order the columns
-    preorder = ["srna_name", "target_ltag", "target_name"]
-    tags = [x for x in resultBenchDF.columns if x not in preorder]
-    neworder = preorder + sorted(tags)
-    resultBenchDF.reindex(columns=neworder)
+    resultBenchDF = rankMatrix([readBenchmark(bench) for bench in benchList])
 
     # Write to csv
     resultBenchDF.to_csv(outputPath, sep=";", index=False)
 
 
+# Add the callIDs to the rank store (unchanged ones are skipped) and write their merged benchmark, runtime and
+# memory files from the store
+def mergeFromStore(storePath, callIDList, benchPath, outputpath):
+    store = openStore(storePath)
+    for callID in callIDList:
+        addCallID(store, os.path.join(benchPath, callID))
+    readRanks(store, callIDList).to_csv(outputpath, sep=";", index=False)
+    for kind, (_, ending) in resourceTables.items():
+        readResources(store, kind, callIDList).to_csv(outputpath[:-len(".csv")] + ending, sep=";", index=False)
+    store.close()
+
+
 # Merge method for memory and time files
 def mergeLogFiles(callIDList, benchPath, outputpath):
     timeDF = pd.read_csv(os.path.join(benchPath, callIDList[0], "runTime.csv"), sep=";", header=0)
@@ -63,14 +70,17 @@ def main(argv):
                         , help="a mandatory ID to differentiate between multiple calls of the script. Specify multiple ones by using callID1 callID2 ...")
     parser.add_argument("-a", "--all", action="store_true", dest="all", default=False
                         , help="When set all available benchmark folders will be merged.")
+    parser.add_argument("--store", action="store", dest="storePath", default=""
+                        , help="path of a rank store (e.g. <bdirs>/benchmarks.sqlite). The callIDs are added to it "
+                               "incrementally and merged from the store.")
     args = parser.parse_args()
 
     # Enforce an outputfile path/name.csv
     if args.outputfile == "":
         sys.exit("Please use: python3 mergeBenchmarks.py -o <path/name.csv> to specify an output file!")
 
-    # read all benchfiles in folder
-    allIDfolders = [x for x in glob.glob(os.path.join(args.benchFilePath, "*")) if os.path.isdir(x)]
+    # all benchmarked callIDs of the folder (from the result catalog)
+    allIDfolders = [os.path.join(args.benchFilePath, x) for x in catalogCallIDs(args.benchFilePath, "benchmark")]
 
     if not args.all:
         # Check whether callIDs were given
@@ -85,7 +95,9 @@ def main(argv):
                     toBeMerged.append(os.path.join(folder, args.infileName))
                     existingCallIDs.append(bID)
 
-        if len(toBeMerged) > 1:
+        if len(toBeMerged) > 1 and args.storePath != "":
+            mergeFromStore(args.storePath, existingCallIDs, args.benchFilePath, args.outputfile)
+        elif len(toBeMerged) > 1:
             mergeBenchmarks(toBeMerged, args.outputfile)
             mergeLogFiles(existingCallIDs, args.benchFilePath, args.outputfile)
         else:
@@ -95,10 +107,13 @@ def main(argv):
     else:
         if len(allIDfolders) > 1:
             allIDfolders = [os.path.join(x, args.infileName) for x in allIDfolders]
-
-            mergeBenchmarks(allIDfolders, args.outputfile)
             allIDs = [x.split(os.path.sep)[-2] for x in allIDfolders]
-            mergeLogFiles(allIDs, args.benchFilePath, args.outputfile)
+
+            if args.storePath != "":
+                mergeFromStore(args.storePath, allIDs, args.benchFilePath, args.outputfile)
+            else:
+                mergeBenchmarks(allIDfolders, args.outputfile)
+                mergeLogFiles(allIDs, args.benchFilePath, args.outputfile)
         else:
             sys.exit("Not enough files to merge!")
 
@@ -3,13 +3,15 @@
 
 import sys, argparse
 import os
-import pandas as pd
 import re
 import operator
 import numpy as np
 import configparser
 import matplotlib
 
+from rankStore import readPlotTable
+from rankCurves import rankCurves
+
 matplotlib.use('Agg')
 from itertools import cycle
 import matplotlib.pyplot as plt
@@ -68,20 +70,10 @@ def set_violin_limits(ax, config):
         ax.axes.set_ylim(top=int(config["violin"]["maxY"]))
 
 def determine_ranks(args, config):
-    benchDF = pd.read_csv(args.inputFile, sep=args.separator, header=0)
-    prefix = ["srna_name", "target_ltag", "target_name"]
-    intarnaIDs = [x.replace("_intarna_rank", "") for x in benchDF.columns if x not in prefix]
-
-    rankDictionary = dict()
-    # Init dictionary
-    for entry in intarnaIDs:
-        rankDictionary[entry] = []
+    benchDF = readPlotTable("benchmark", args.inputFile, args.separator, args.storePath, args.callIDs)
 
     # Get the ranks for each callID
-    for i in range(1, int(config["general"]["end"])):
-        for id in intarnaIDs:
-            rankDictionary[id].append(len(benchDF[benchDF[id+"_intarna_rank"] <= i]))
-    return rankDictionary
+    return rankCurves(benchDF, 1, int(config["general"]["end"]))
 
 def plot_merged(args, config):
     rankDictionary = determine_ranks(args, config)
@@ -190,14 +182,9 @@ def plot_merged(args, config):
     plt.close()
 
 def plot_time(args, config):
-    runTimeFile = os.path.splitext(args.inputFile)[0] + "_runTimes.csv"
-
-    if not os.path.exists(runTimeFile):
-        sys.exit("no runTimeFile found!!")
-
-    # Read the csv files
-    timeDF = pd.read_csv(runTimeFile, sep=args.separator, header=0)
-    benchDF = pd.read_csv(args.inputFile, sep=args.separator, header=0)
+    # Read the csv files (or the rank store)
+    timeDF = readPlotTable("runTime", args.inputFile, args.separator, args.storePath, args.callIDs)
+    benchDF = readPlotTable("benchmark", args.inputFile, args.separator, args.storePath, args.callIDs)
 
     prefix = ["srna_name", "target_ltag", "target_name"]
     # remove the _intarna_rank suffixes
@@ -314,14 +301,9 @@ def plot_time(args, config):
     plt.close()
 
 def plot_memory(args, config):
-    memoryFile = os.path.splitext(args.inputFile)[0] + "_MaxMemoryUsage.csv"
-
-    if not os.path.exists(memoryFile):
-        sys.exit("no maxMemoryUsage file found!!")
-
-    # Read the csv files
-    memoryDF = pd.read_csv(memoryFile, sep=args.separator, header=0)
-    benchDF = pd.read_csv(args.inputFile, sep=args.separator, header=0)
+    # Read the csv files (or the rank store)
+    memoryDF = readPlotTable("memoryUsage", args.inputFile, args.separator, args.storePath, args.callIDs)
+    benchDF = readPlotTable("benchmark", args.inputFile, args.separator, args.storePath, args.callIDs)
 
     prefix = ["srna_name", "target_ltag", "target_name"]
     # remove the _intarna_rank suffixes
@@ -437,8 +419,12 @@ def plot_memory(args, config):
 
 def main(argv):
     parser = argparse.ArgumentParser(description="Script for plotting the benchmark results")
-    parser.add_argument("-i", "--ifile", action="store", dest="inputFile", required=True
-                        , help="mandatory benchmark file to be used for plotting.")
+    parser.add_argument("-i", "--ifile", action="store", dest="inputFile", default=""
+                        , help="mandatory benchmark file to be used for plotting (unless --store is given).")
+    parser.add_argument("--store", action="store", dest="storePath", default=""
+                        , help="read the benchmark, runtime and memory tables from this rank store instead (see rankStore.py).")
+    parser.add_argument("--callIDs", nargs="*", dest="callIDs", default=None
+                        , help="the callIDs read from the rank store: callID1 callID2 ... Default: all callIDs of the store")
     parser.add_argument("-o", "--ofile", action="store", dest="outputFile", required=True
                         , help="the path of the outputFilePath.")
     parser.add_argument("-s", "--sep", action="store", dest="separator", default=";"
@@ -457,6 +443,9 @@ def main(argv):
                         , help="create additional plots for the memory consumption.")
     args = parser.parse_args()
 
+    if args.inputFile == "" and args.storePath == "":
+        sys.exit("Please specify a benchmark file using -i <filename.csv> or a rank store using --store <path>!")
+
     # Read the config file
     config = configparser.ConfigParser()
     config.sections()
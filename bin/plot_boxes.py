@@ -4,15 +4,16 @@
 import sys, argparse
 import os
 import re
-import operator
 
-import pandas as pd
 import numpy as np
 
 from itertools import cycle
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from rankStore import readPlotTable
+from rankCurves import rankCurves, differenceTable
+
 ########################################################################################################################
 #                                                                                                                      #
 #                                   Plot contents of a given benchmark.csv file                                        #
@@ -51,8 +52,8 @@ def set_axis_style(ax, labels):
 
 def main(argv):
     parser = argparse.ArgumentParser(description="Script for plotting the benchmark results")
-    parser.add_argument("-i", "--ifile", action="store", dest="benchmarkFile", required=True
-                        , help="benchmark file to be used for plotting.")
+    parser.add_argument("-i", "--ifile", action="store", dest="benchmarkFile", default=""
+                        , help="benchmark file to be used for plotting (unless --store is given).")
     parser.add_argument("-o", "--ofile", action="store", dest="outFile", required=True
                         , help="the path of the output pdf.")
     parser.add_argument("-f", "--fixed", action="store", dest="fixedID", required=True
@@ -67,28 +68,25 @@ def main(argv):
                         , help="the separator used in the benchmarkFile")
     parser.add_argument("--info", action="store_true", dest="info", default=False
                         , help="create time and memory plots.")
+    parser.add_argument("--store", action="store", dest="storePath", default=""
+                        , help="read the benchmark, runtime and memory tables from this rank store instead (see rankStore.py).")
+    parser.add_argument("--callIDs", nargs="*", dest="callIDs", default=None
+                        , help="the callIDs read from the rank store: callID1 callID2 ... Default: all callIDs of the store")
     args = parser.parse_args()
 
     # if Benchmark file exists plot the data
-    if os.path.exists(args.benchmarkFile):
+    if os.path.exists(args.benchmarkFile) or args.storePath != "":
         # Ensure that the ranks are sorted and set targetEnd
         thresholds = sorted(args.ranks)
         targetEnd = thresholds[-1]
 
         # Handle the input and build a dictionary for the ranks up to targetEnd (200)
-        benchDF = pd.read_csv(args.benchmarkFile, sep=args.separator, header=0)
+        benchDF = readPlotTable("benchmark", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
         prefix = ["srna_name", "target_ltag", "target_name"]
         intarnaIDs = [x.replace("_intarna_rank", "") for x in benchDF.columns if x not in prefix]
 
-        rankDictionary = dict()
-        # Init dictionary
-        for entry in intarnaIDs:
-            rankDictionary[entry] = []
-
         # Get the ranks for each callID
-        for i in range(0, targetEnd):
-            for id in intarnaIDs:
-                rankDictionary[id].append(len(benchDF[benchDF[id + "_intarna_rank"] <= i]))
+        rankDictionary = rankCurves(benchDF, 0, targetEnd)
 
         # Create merged plots
         colorcycler = cycle(colorList[::-1])
@@ -124,20 +122,9 @@ def main(argv):
         keys = list(rankDictionary.keys())
         human_sort(keys)
 
-        # Create dataframe to use seaborn boxplot
-        boxDataFrame = pd.DataFrame(index=np.arange(0, sum(thresholds)*len(keys)),columns=["key", "threshold", "value"])
-
-        idx = 0
-        # one idx per future row (avoid append function as it copys the dataframe every time a row is appended)
-        for key in keys:
-            boxData = list(map(operator.sub, rankDictionary[key], refData))
-            for threshold in thresholds:
-                for value in boxData[:threshold]:
-                    boxDataFrame.loc[idx] = [key, threshold, value]
-                    idx+=1
-
-        # ensure values are integer
-        boxDataFrame["value"] = boxDataFrame["value"].astype(int)
+        # Create the long-form dataframe for the seaborn boxplot: for each key and threshold the differences of its
+        # curve to the reference curve up to the threshold
+        boxDataFrame = differenceTable(rankDictionary, refData, keys, thresholds)
 
         # Plot the boxplots
         sns.boxplot(x="threshold", y="value", hue="key", data=boxDataFrame, ax=ax2, palette=colorList[::-1][:len(keys)])
@@ -165,16 +152,8 @@ def main(argv):
 
     # Time and Memory plots
     if (args.info):
-        runTimeFile = os.path.splitext(args.benchmarkFile)[0] + "_runTimes.csv"
-        memoryFile = os.path.splitext(args.benchmarkFile)[0] + "_MaxMemoryUsage.csv"
-
-        if not os.path.exists(runTimeFile):
-            sys.exit("no runTimeFile found!!")
-        if not os.path.exists(memoryFile):
-            sys.exit("no maxMemoryUsage file found!!")
-
-        timeDF = pd.read_csv(runTimeFile, sep=args.separator, header=0)
-        memoryDF = pd.read_csv(memoryFile, sep=args.separator, header=0)
+        timeDF = readPlotTable("runTime", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
+        memoryDF = readPlotTable("memoryUsage", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
 
         human_sort(intarnaIDs)
 
@@ -3,12 +3,14 @@
 
 import sys, argparse
 import os
-import pandas as pd
 import matplotlib
 import re
 import operator
 import numpy as np
 
+from rankStore import readPlotTable
+from rankCurves import rankCurves
+
 matplotlib.use('Agg')
 from itertools import cycle
 import matplotlib.pyplot as plt
@@ -79,27 +81,24 @@ def main(argv):
                         , help="The fontsize of the legend.")
     parser.add_argument("--time", action="store_true", dest="time", default=False
                         , help="plot only the time")
+    parser.add_argument("--store", action="store", dest="storePath", default=""
+                        , help="read the benchmark, runtime and memory tables from this rank store instead (see rankStore.py).")
+    parser.add_argument("--callIDs", nargs="*", dest="callIDs", default=None
+                        , help="the callIDs read from the rank store: callID1 callID2 ... Default: all callIDs of the store")
 
     args = parser.parse_args()
 
-    if args.benchmarkFile == "":
-        sys.exit("Please specify a benchmark.csv with: python3 plot_performance.py -i <filename.csv> !")
+    if args.benchmarkFile == "" and args.storePath == "":
+        sys.exit("Please specify a benchmark.csv with: python3 plot_performance.py -i <filename.csv> (or a rank store with --store <path>)!")
 
 
-    if os.path.exists(args.benchmarkFile):
-        benchDF = pd.read_csv(args.benchmarkFile, sep=args.separator, header=0)
+    if os.path.exists(args.benchmarkFile) or args.storePath != "":
+        benchDF = readPlotTable("benchmark", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
         prefix = ["srna_name", "target_ltag", "target_name"]
         intarnaIDs = [x.replace("_intarna_rank", "") for x in benchDF.columns if x not in prefix]
 
-        rankDictionary = dict()
-        # Init dictionary
-        for entry in intarnaIDs:
-            rankDictionary[entry] = []
-
         # Get the ranks for each callID
-        for i in range(1, args.end):
-            for id in intarnaIDs:
-                rankDictionary[id].append(len(benchDF[benchDF[id+"_intarna_rank"] <= i]))
+        rankDictionary = rankCurves(benchDF, 1, args.end)
 
         # plot type roc
         if args.plotType == "split":
@@ -268,16 +267,8 @@ def main(argv):
 
         # Time and Memory plots
         if (args.additional):
-            runTimeFile = os.path.splitext(args.benchmarkFile)[0] + "_runTimes.csv"
-            memoryFile = os.path.splitext(args.benchmarkFile)[0] + "_MaxMemoryUsage.csv"
-
-            if not os.path.exists(runTimeFile):
-                sys.exit("no runTimeFile found!!")
-            if not os.path.exists(memoryFile):
-                sys.exit("no maxMemoryUsage file found!!")
-
-            timeDF = pd.read_csv(runTimeFile, sep=args.separator, header=0)
-            memoryDF = pd.read_csv(memoryFile, sep=args.separator, header=0)
+            timeDF = readPlotTable("runTime", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
+            memoryDF = readPlotTable("memoryUsage", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
 
             human_sort(intarnaIDs)
 
@@ -391,12 +382,7 @@ def main(argv):
 
 
         if args.time:
-            runTimeFile = os.path.splitext(args.benchmarkFile)[0] + "_runTimes.csv"
-
-            if not os.path.exists(runTimeFile):
-                sys.exit("no runTimeFile found!!")
-
-            timeDF = pd.read_csv(runTimeFile, sep=args.separator, header=0)
+            timeDF = readPlotTable("runTime", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
 
             human_sort(intarnaIDs)
 
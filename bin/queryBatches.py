@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import os
+
+from targetShards import readFastaRecords, balanceShards
+from costModel import sequenceLengths
+from jobManifest import updateJob, fileChecksum
+from intarnaOutput import openOutput, compressionOf
+
+########################################################################################################################
+#                                                                                                                      #
+#            Batching of queries: one IntaRNA call handles the queries of a batch (multi-FASTA) against a target,      #
+#          so the target is loaded and folded once per batch instead of once per query. The combined output is         #
+#        split by id2 into the output files of the single queries, the resource usage of the batch is attributed       #
+#                                     to its queries proportional to their lengths.                                    #
+#                                                                                                                      #
+########################################################################################################################
+
+# Resource counters that are divided between the queries of a batch, all others (e.g. maxRSS) are taken as they are
+attributedResources = ["wallTime", "userTime", "systemTime", "minorPageFaults", "majorPageFaults",
+                       "voluntaryContextSwitches", "involuntaryContextSwitches", "readBytes", "writtenBytes"]
+
+
+# Divide query files into at most nBatches batches with balanced summed sequence lengths
+# return: list of batches (lists of query files in their given order)
+def batchQueries(queryFiles, nBatches):
+    nBatches = max(1, min(nBatches, len(queryFiles)))
+    assignment = balanceShards([sequenceLengths(x)[0] for x in queryFiles], nBatches)
+    return [[x for x, batch in zip(queryFiles, assignment) if batch == i] for i in range(nBatches)]
+
+
+# Write the multi-FASTA query file of a batch. An existing file is reused, as the batches are deterministic.
+def writeBatchQuery(queryFiles, batchFile):
+    if os.path.exists(batchFile):
+        return
+    os.makedirs(os.path.dirname(batchFile), exist_ok=True)
+    with open(batchFile + ".tmp", "w") as batch:
+        for queryFile in queryFiles:
+            for header, lines in readFastaRecords(queryFile):
+                batch.write(header)
+                batch.writelines(lines)
+    os.replace(batchFile + ".tmp", batchFile)
+
+
+# The sequence ids of a FASTA file, as reported by IntaRNA (first word of the header)
+def recordIds(fastaFile):
+    return [header[1:].split()[0] for header, _ in readFastaRecords(fastaFile) if header[1:].strip() != ""]
+
+
+# Split the CSV output (--outMode C) of a batch by the query id (id2) into the output files of the single queries.
+# outputs: dictionary query id -> output file (each output file gets the header, even without interactions)
+# Each output file is published atomically, the batch output is removed afterwards.
+def splitBatchOutput(batchOutput, outputs):
+    handles = dict((path, openOutput(path + ".tmp", "wt", compressionOf(path))) for path in set(outputs.values()))
+    try:
+        with openOutput(batchOutput) as combined:
+            header = combined.readline()
+            for handle in handles.values():
+                handle.write(header)
+            column = header.strip().split(";").index("id2") if header != "" else None
+            for line in combined:
+                queryId = line.split(";")[column]
+                if queryId in outputs:
+                    handles[outputs[queryId]].write(line)
+                else:
+                    print("Warning: unknown query %s in %s" % (queryId, batchOutput))
+    finally:
+        for handle in handles.values():
+            handle.close()
+    for path in handles:
+        os.replace(path + ".tmp", path)
+    os.remove(batchOutput)
+
+
+# Attribute the resource record of a batch to its queries, proportional to the given weights (query lengths).
+# The peak memory of the batch is reported for each query.
+# return: list with one resource record per weight
+def attributeResources(record, weights):
+    total = sum(weights)
+    records = []
+    for weight in weights:
+        share = weight / total if total > 0 else 1 / len(weights)
+        member = dict(record)
+        for resource in attributedResources:
+            if resource in member:
+                member[resource] = round(member[resource] * share, 3) if isinstance(member[resource], float) \
+                    else int(round(member[resource] * share))
+        member["share"] = round(share, 4)
+        records.append(member)
+    return records
+
+
+# Run a batch with the given runner and track the state of all its queries in the manifest (see runTrackedJob).
+# onDone (optional) is called with each query job and its attributed resource record after a successful run.
+# return: resource record of the batch (None if it failed)
+def runTrackedBatch(manifest, runner, batch, onDone=None):
+    for member in batch["members"]:
+        updateJob(manifest, member["key"], state="running", batch=batch["key"])
+    try:
+        record = runner(batch["callArgs"], batch["log"], batch.get("stream"))
+        outputs = dict((queryId, member["partOut"]) for member in batch["members"] for queryId in recordIds(member["query"]))
+        splitBatchOutput(batch["partOut"], outputs)
+    except Exception as e:
+        print("Batch %s failed: %s" % (batch["key"], e))
+        for member in batch["members"]:
+            updateJob(manifest, member["key"], state="failed", resources=getattr(e, "record", None))
+        return None
+
+    weights = [sequenceLengths(member["query"])[0] for member in batch["members"]]
+    for member, memberRecord in zip(batch["members"], attributeResources(record, weights)):
+        updateJob(manifest, member["key"], state="done", resources=memberRecord, checksum=fileChecksum(member["partOut"]))
+        if onDone is not None:
+            onDone(member, memberRecord)
+    return record
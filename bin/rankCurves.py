@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import numpy as np
+import pandas as pd
+
+from benchmark import readVerifiedInteractions
+from rankStore import readPlotTable
+
+########################################################################################################################
+#                                                                                                                      #
+#       Rank-at-k (ROC) curves of many callIDs at once: the number of verified interactions ranked within the top k    #
+#     for each k, computed from one histogram and cumulative sum over the rank matrix (verified interactions x         #
+#     callIDs) instead of filtering the benchmark for every k and callID. The curves can be split by sRNA or organism. #
+#                                          Used by all plot scripts.                                                   #
+#                                                                                                                      #
+########################################################################################################################
+
+# Columns identifying a verified interaction in the benchmark table
+interactionColumns = ["srna_name", "target_ltag", "target_name"]
+
+
+# The callIDs and the rank matrix (one column per callID) of a benchmark table (see mergeBenchmarks.py/rankStore.py)
+def rankColumns(benchDF):
+    columns = [x for x in benchDF.columns if x not in interactionColumns]
+    return [x.replace("_intarna_rank", "") for x in columns], benchDF[columns].to_numpy(dtype=float)
+
+
+# The organism of each verified interaction of a benchmark table, taken from the verified interactions
+def interactionOrganisms(benchDF, verified_interactions):
+    organisms = dict()
+    for (srna_name, organism), targets in readVerifiedInteractions(verified_interactions)["hybrids"].items():
+        for target_ltag, target_name in targets:
+            organisms.setdefault((srna_name, target_ltag, target_name), organism)
+    return pd.Series([organisms.get(x, "NA") for x in benchDF[interactionColumns].itertuples(index=False, name=None)],
+                     index=benchDF.index)
+
+
+# The rank-at-k curves of all callIDs of a benchmark table: the number of verified interactions with rank <= k
+# for k = start, ..., end - 1.
+# facets: labels of the rows (e.g. benchDF["srna_name"] or interactionOrganisms), each facet gets its own curves
+# return: dictionary callID -> list of counts, or dictionary facet -> (dictionary callID -> list of counts) for facets
+def rankCurves(benchDF, start, end, facets=None):
+    callIDs, ranks = rankColumns(benchDF)
+    if facets is None:
+        codes, labels = np.zeros(len(benchDF), dtype=int), [None]
+    else:
+        codes, labels = pd.factorize(pd.Series(facets, index=benchDF.index), sort=True)
+    # ranks above end - 1 (and missing ranks) share the last bin, they are never counted
+    bins = np.nan_to_num(np.clip(ranks, 0, end), nan=end).astype(int)
+    offsets = (codes[:, None] * len(callIDs) + np.arange(len(callIDs))[None, :]) * (end + 1)
+    counts = np.bincount((offsets + bins).ravel(), minlength=len(labels) * len(callIDs) * (end + 1))
+    curves = counts.reshape(len(labels), len(callIDs), end + 1).cumsum(axis=2)[:, :, start:end]
+
+    facetCurves = dict((label, dict(zip(callIDs, curves[i].tolist()))) for i, label in enumerate(labels))
+    return facetCurves[None] if facets is None else facetCurves
+
+
+# The long-form table of the differences of curves to a reference curve (the box plots of plot_boxes.py): for each key
+# and threshold the differences at k = 0, ..., threshold - 1, taken from one difference matrix (keys x k)
+# curves: dictionary key -> curve (see rankCurves), thresholds: sorted, the curves hold at least thresholds[-1] counts
+# return: DataFrame with the columns key (categorical, in the order of keys), threshold and value
+def differenceTable(curves, reference, keys, thresholds):
+    end = thresholds[-1]
+    differences = np.array([curves[key][:end] for key in keys], dtype=int).reshape(len(keys), end) \
+        - np.array(reference[:end], dtype=int)
+    # the columns 0, ..., threshold - 1 of the difference matrix for each threshold
+    lengths = np.array(thresholds, dtype=int)
+    columns = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return pd.DataFrame({"key": pd.Categorical(np.repeat(keys, lengths.sum()), categories=keys),
+                         "threshold": np.tile(np.repeat(lengths, lengths), len(keys)),
+                         "value": differences[:, columns].ravel()})
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Write the rank-at-k curves of the callIDs of a benchmark.")
+    parser.add_argument("-i", "--ifile", action="store", dest="benchmarkFile", default=""
+                        , help="benchmark file (merged by mergeBenchmarks.py), unless --store is given.")
+    parser.add_argument("-o", "--ofile", action="store", dest="outFile", required=True
+                        , help="the path of the csv file of the curves.")
+    parser.add_argument("-e", "--end", action="store", dest="end", default=200, type=int
+                        , help="the curves are computed for k = 1, ..., end - 1. Default: 200")
+    parser.add_argument("--facet", action="store", dest="facet", default="none", choices=["none", "srna", "organism"]
+                        , help="compute the curves of each sRNA or organism. Default: none")
+    parser.add_argument("-v", "--verified", action="store", dest="verified_interactions", default="./verified_interactions.csv"
+                        , help="The path to the file containing the verified interactions (for --facet organism).")
+    parser.add_argument("--sep", action="store", dest="separator", default=";"
+                        , help="the separator used in the benchmarkFile")
+    parser.add_argument("--store", action="store", dest="storePath", default=""
+                        , help="read the benchmark from this rank store instead (see rankStore.py).")
+    parser.add_argument("--callIDs", nargs="*", dest="callIDs", default=None
+                        , help="the callIDs read from the rank store: callID1 callID2 ... Default: all callIDs of the store")
+    args = parser.parse_args()
+
+    if args.benchmarkFile == "" and args.storePath == "":
+        sys.exit("Please specify a benchmark file with -i <filename.csv> (or a rank store with --store <path>)!")
+
+    benchDF = readPlotTable("benchmark", args.benchmarkFile, args.separator, args.storePath, args.callIDs)
+    if args.facet == "srna":
+        curves = rankCurves(benchDF, 1, args.end, benchDF["srna_name"])
+    elif args.facet == "organism":
+        if not os.path.exists(args.verified_interactions):
+            sys.exit("Error: %s! File not found!" % args.verified_interactions)
+        curves = rankCurves(benchDF, 1, args.end, interactionOrganisms(benchDF, args.verified_interactions))
+    else:
+        curves = {"all": rankCurves(benchDF, 1, args.end)}
+
+    with open(args.outFile, "w") as f:
+        print("callID;facet;" + ";".join(str(k) for k in range(1, args.end)), file=f)
+        for facet in curves:
+            for callID, counts in curves[facet].items():
+                print("%s;%s;%s" % (callID, facet, ";".join(str(x) for x in counts)), file=f)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
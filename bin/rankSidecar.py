@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from jobExecutor import availableCores
+from intarnaOutput import readOutput, outputStem
+from resultCatalog import loadCatalog, findResults
+
+########################################################################################################################
+#                                                                                                                      #
+#     Rank sidecar of an IntaRNA output (<srna>_<target>.ranks.npy): the best energy of each target and its dense      #
+#   energy rank, sorted by target id, stamped with the size and modification time of the output. Ranking any set of    #
+#    targets is a lookup in the memory mapped sidecar instead of parsing the output. calls.py writes the sidecar of    #
+#                 each final output, this script builds the sidecars of existing callIDs in parallel.                  #
+#                                                                                                                      #
+########################################################################################################################
+
+sidecarEnding = ".ranks.npy"
+
+
+# The sidecar file of an output file
+def sidecarPath(path):
+    return outputStem(path) + sidecarEnding
+
+
+# The memory mapped target records of the sidecar of an output
+# return: the records (id, rank, E) sorted by id, None if there is no sidecar or it was written for another version of
+#         the output (size or modification time differ, e.g. an output replaced by a cache hardlink or cp -p)
+def loadSidecar(path):
+    try:
+        sidecar = np.load(sidecarPath(path), mmap_mode="r")
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if sidecar.dtype.names is None or "targets" not in sidecar.dtype.names \
+            or int(sidecar["size"]) != stat.st_size or int(sidecar["mtime"]) != stat.st_mtime_ns:
+        return None
+    return sidecar["targets"]
+
+
+# Whether the sidecar of an output exists and was written for its current version
+def isFresh(path):
+    return loadSidecar(path) is not None
+
+
+# Write the sidecar of an output (unless it is up to date): one record (id, rank, E) per target with its best energy
+# and the number of distinct (rounded) energies of the output up to it, sorted by id, and the size and modification
+# time of the output
+# return: True if the sidecar was written, False if it was up to date or the output could not be parsed
+def updateSidecar(path, force=False):
+    if not force and isFresh(path):
+        return False
+    # the stamp is taken before the output is read, an output changed meanwhile gets a stale sidecar
+    stat = os.stat(path)
+    try:
+        df = readOutput(path, ["id1", "E"])
+    except pd.errors.ParserError:
+        return False
+    # the best energy of each target, sorted by id
+    best = df.groupby("id1")["E"].min()
+    ranks = np.searchsorted(np.unique(df["E"].round(2).to_numpy()), best.round(2).to_numpy(), side="right")
+    width = max([len(x) for x in best.index] + [1])
+    targets = np.dtype([("id", "U%d" % width), ("rank", "int32"), ("E", "float64")])
+    sidecar = np.zeros((), dtype=[("size", "int64"), ("mtime", "int64"), ("targets", targets, (len(best),))])
+    sidecar["size"], sidecar["mtime"] = stat.st_size, stat.st_mtime_ns
+    records = sidecar["targets"]
+    records["id"], records["rank"], records["E"] = best.index.to_numpy(dtype=str), ranks, best.to_numpy()
+    with open(sidecarPath(path) + ".tmp", "wb") as f:
+        np.save(f, sidecar)
+    os.replace(sidecarPath(path) + ".tmp", sidecarPath(path))
+    return True
+
+
+# The ranks of the given targets in an output from its sidecar (targets not in the output are left out)
+# return: dictionary target id -> rank, None if the output has no up to date sidecar
+def sidecarRanks(path, targets):
+    sidecar = loadSidecar(path)
+    if sidecar is None:
+        return None
+    targets = np.array(sorted(set(targets)), dtype=str)
+    if len(sidecar) == 0 or len(targets) == 0:
+        return dict()
+    positions = np.minimum(np.searchsorted(sidecar["id"], targets), len(sidecar) - 1)
+    found = sidecar["id"][positions] == targets
+    return dict(zip(targets[found].tolist(), sidecar["rank"][positions[found]].tolist()))
+
+
+# Write the sidecar of an output file, used by the process pool
+# return: (path, True if written)
+def backfillOutput(force, path):
+    return path, updateSidecar(path, force)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Write the rank sidecars of the outputs of existing callIDs.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder containing the callID folders. Default: ./output")
+    parser.add_argument("-c", "--callID", nargs="*", dest="callIDs", default=[]
+                        , help="the callIDs to handle. Specify multiple ones by using callID1 callID2 ...")
+    parser.add_argument("-a", "--all", action="store_true", dest="all", default=False
+                        , help="When set the outputs of all callIDs of the output folder are handled.")
+    parser.add_argument("-j", "--jobs", action="store", dest="jobs", default=-1, type=int
+                        , help="The number of outputs handled at the same time, -1 for all available cores. Default: -1")
+    parser.add_argument("-f", "--force", action="store_true", dest="force", default=False
+                        , help="When set all sidecars are written again, even if they are up to date.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.outputPath):
+        sys.exit("Error!!! The output folder %s does not exist!" % args.outputPath)
+    catalog = loadCatalog(args.outputPath)
+    if args.all:
+        callIDs = sorted(catalog)
+    elif args.callIDs != []:
+        callIDs = args.callIDs
+        for callID in callIDs:
+            if callID not in catalog:
+                sys.exit("Error!!! No directory found for callID %s!" % callID)
+    else:
+        sys.exit("Please specify the callIDs to handle using -c <name1 name2> or -a for all callIDs!")
+
+    files = [x["path"] for x in findResults(args.outputPath, callIDs, catalog=catalog)]
+    if files == []:
+        sys.exit("Error!!! No outputs found!")
+    nJobs = availableCores() if args.jobs == -1 else max(1, args.jobs)
+    with ProcessPoolExecutor(max_workers=min(nJobs, len(files))) as pool:
+        written = sum(1 for _, done in pool.map(partial(backfillOutput, args.force), files, chunksize=8) if done)
+    print("Wrote %d sidecars for %d outputs of %d callIDs!" % (written, len(files), len(callIDs)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
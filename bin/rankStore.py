@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import time
+import sqlite3
+import pandas as pd
+
+from jobManifest import fileChecksum
+from resultCatalog import catalogCallIDs
+
+########################################################################################################################
+#                                                                                                                      #
+#           Persistent rank store (SQLite) of all benchmarked callIDs of an output folder: the ranks of the verified   #
+#        interactions, the runtimes and the memory usage of each callID. CallIDs are added incrementally (only new     #
+#          or changed benchmarks are read), readers get the rank matrix (verified interactions x callIDs) and the      #
+#                               runtime/memory tables of just the callIDs they need.                                   #
+#                                                                                                                      #
+########################################################################################################################
+
+# Columns identifying a verified interaction in benchmark.csv
+interactionColumns = ["srna_name", "target_ltag", "target_name"]
+
+# Tables of a callID folder stored besides the ranks, and the names of their merged csv files (see mergeBenchmarks.py)
+resourceTables = {"runTime": ("runTime.csv", "_runTimes.csv"), "memoryUsage": ("memoryUsage.csv", "_MaxMemoryUsage.csv")}
+
+storeSchema = """
+CREATE TABLE IF NOT EXISTS callIDs (callID TEXT PRIMARY KEY, checksum TEXT, added REAL);
+CREATE TABLE IF NOT EXISTS interactions (id INTEGER PRIMARY KEY, srna_name TEXT, target_ltag TEXT, target_name TEXT,
+                                         occurrence INTEGER, UNIQUE (srna_name, target_ltag, target_name, occurrence));
+CREATE TABLE IF NOT EXISTS ranks (callID TEXT, interaction INTEGER, rank INTEGER, PRIMARY KEY (callID, interaction));
+CREATE TABLE IF NOT EXISTS resources (callID TEXT, kind TEXT, row INTEGER, target_name TEXT, organism TEXT,
+                                      position INTEGER, srna_name TEXT, value REAL,
+                                      PRIMARY KEY (callID, kind, row, position));
+"""
+
+
+# Open (and create) the rank store at the given path
+def openStore(path):
+    store = sqlite3.connect(path)
+    store.executescript(storeSchema)
+    return store
+
+
+# The callIDs in the rank store, sorted by name
+def storedCallIDs(store):
+    return [x for x, in store.execute("SELECT callID FROM callIDs ORDER BY callID")]
+
+
+# Read a benchmark.csv indexed by its verified interactions. An interaction listed more than once
+# (e.g. for two organisms) is told apart by its occurrence.
+def readBenchmark(path):
+    df = pd.read_csv(path, sep=";", header=0, dtype={"srna_name": str, "target_ltag": str, "target_name": str})
+    df["occurrence"] = df.groupby(interactionColumns).cumcount()
+    return df.set_index(interactionColumns + ["occurrence"])
+
+
+# Join the benchmarks of several callIDs in one step (instead of pairwise merges), only interactions ranked in all of
+# them are kept. The rank columns are ordered by callID.
+# benchmarks: list of benchmark DataFrames (see readBenchmark)
+def rankMatrix(benchmarks):
+    matrix = pd.concat(benchmarks, axis=1, join="inner")
+    matrix = matrix.reindex(columns=sorted(matrix.columns))
+    return matrix.reset_index().drop(columns="occurrence")
+
+
+# The checksum of the tables of a callID folder in the store: the checksums of its benchmark.csv and resource tables
+# (None if the callID has no benchmark)
+def tablesChecksum(callFolder):
+    benchmarkChecksum = fileChecksum(os.path.join(callFolder, "benchmark.csv"))
+    if benchmarkChecksum is None:
+        return None
+    return ";".join([benchmarkChecksum] + [fileChecksum(os.path.join(callFolder, fileName)) or ""
+                                           for fileName, _ in resourceTables.values()])
+
+
+# Add (or replace) the benchmark, runtime and memory table of a callID folder in the store.
+# Unchanged callIDs are skipped (their benchmark.csv and resource tables have the stored checksums).
+# return: True if the callID was added
+def addCallID(store, callFolder):
+    callID = os.path.basename(os.path.normpath(callFolder))
+    benchmarkFile = os.path.join(callFolder, "benchmark.csv")
+    checksum = tablesChecksum(callFolder)
+    if checksum is None:
+        return False
+    stored = store.execute("SELECT checksum FROM callIDs WHERE callID = ?", (callID,)).fetchone()
+    if stored is not None and stored[0] == checksum:
+        return False
+
+    benchmark = readBenchmark(benchmarkFile)
+    with store:
+        for table in ["callIDs", "ranks", "resources"]:
+            store.execute("DELETE FROM %s WHERE callID = ?" % table, (callID,))
+        store.executemany("INSERT OR IGNORE INTO interactions (srna_name, target_ltag, target_name, occurrence) "
+                          "VALUES (?, ?, ?, ?)", benchmark.index.tolist())
+        ids = dict(((srna, ltag, name, occurrence), i) for i, srna, ltag, name, occurrence
+                   in store.execute("SELECT id, srna_name, target_ltag, target_name, occurrence FROM interactions"))
+        store.executemany("INSERT INTO ranks VALUES (?, ?, ?)",
+                          [(callID, ids[key], int(rank)) for key, rank in zip(benchmark.index, benchmark.iloc[:, 0])])
+
+        for kind, (fileName, _) in resourceTables.items():
+            if not os.path.exists(os.path.join(callFolder, fileName)):
+                continue
+            table = pd.read_csv(os.path.join(callFolder, fileName), sep=";", header=0)
+            rows = []
+            for row, values in enumerate(table.itertuples(index=False)):
+                for position, (srna, value) in enumerate(zip(table.columns[3:], values[3:])):
+                    rows.append((callID, kind, row, values[1], values[2], position, srna,
+                                 None if pd.isna(value) else float(value)))
+            store.executemany("INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        store.execute("INSERT INTO callIDs VALUES (?, ?, ?)", (callID, checksum, time.time()))
+    return True
+
+
+# Add all benchmarked callIDs of an output folder to the store
+# return: the added (new or changed) callIDs
+def updateStore(store, outputPath):
+    added = []
+    for callID in catalogCallIDs(outputPath, "benchmark"):
+        if addCallID(store, os.path.join(outputPath, callID)):
+            added.append(callID)
+    return added
+
+
+# Exit if one of the callIDs is not in the store
+def checkCallIDs(store, callIDs):
+    missing = sorted(set(callIDs) - set(storedCallIDs(store)))
+    if missing != []:
+        sys.exit("Error!!! The callIDs %s are not in the rank store!" % ", ".join(missing))
+
+
+# The rank matrix of the given callIDs (all callIDs if None), as merged by mergeBenchmarks.py:
+# srna_name, target_ltag, target_name and one <callID>_intarna_rank column per callID
+def readRanks(store, callIDs=None):
+    callIDs = storedCallIDs(store) if callIDs is None else callIDs
+    checkCallIDs(store, callIDs)
+    benchmarks = []
+    for callID in callIDs:
+        df = pd.read_sql_query("SELECT srna_name, target_ltag, target_name, occurrence, rank FROM ranks "
+                               "JOIN interactions ON interaction = id WHERE callID = ? ORDER BY interaction",
+                               store, params=(callID,))
+        benchmarks.append(df.set_index(interactionColumns + ["occurrence"])["rank"].rename(callID + "_intarna_rank"))
+    return rankMatrix(benchmarks)
+
+
+# The runtime or memory table (kind "runTime"/"memoryUsage") of the given callIDs (all callIDs if None),
+# as merged by mergeBenchmarks.py: callID, target_name, Organism and one column per srna, sorted by callID
+def readResources(store, kind, callIDs=None):
+    callIDs = storedCallIDs(store) if callIDs is None else callIDs
+    checkCallIDs(store, callIDs)
+    tables = []
+    for callID in sorted(callIDs):
+        df = pd.read_sql_query("SELECT row, target_name, organism, position, srna_name, value FROM resources "
+                               "WHERE callID = ? AND kind = ? ORDER BY row, position", store, params=(callID, kind))
+        srnas = list(dict.fromkeys(df["srna_name"]))
+        table = df.pivot(index=["row", "target_name", "organism"], columns="srna_name", values="value")
+        table = table.reindex(columns=srnas)
+        # integral measurements (memory in kilobytes) stay integers
+        for srna in srnas:
+            if (table[srna].dropna() % 1 == 0).all():
+                table[srna] = table[srna].astype("Int64")
+        table = table.reset_index().drop(columns="row")
+        table.insert(0, "callID", callID)
+        tables.append(table.rename(columns={"organism": "Organism"}))
+    return pd.concat(tables, ignore_index=True) if tables != [] else pd.DataFrame()
+
+
+# The benchmark table, runtime table and memory table used by the plot scripts: from the rank store (only the given
+# callIDs) if storePath is given, otherwise from the merged files of mergeBenchmarks.py (<benchmarkFile>,
+# <benchmarkFile>_runTimes.csv and <benchmarkFile>_MaxMemoryUsage.csv)
+# kind: "benchmark", "runTime" or "memoryUsage"
+def readPlotTable(kind, benchmarkFile, separator=";", storePath="", callIDs=None):
+    if storePath != "":
+        if not os.path.exists(storePath):
+            sys.exit("Error!!! Rank store %s not found!" % storePath)
+        store = openStore(storePath)
+        try:
+            return readRanks(store, callIDs) if kind == "benchmark" else readResources(store, kind, callIDs)
+        finally:
+            store.close()
+    path = benchmarkFile if kind == "benchmark" else os.path.splitext(benchmarkFile)[0] + resourceTables[kind][1]
+    if not os.path.exists(path):
+        sys.exit("no %s file found!!" % path)
+    return pd.read_csv(path, sep=separator, header=0)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Add the benchmarked callIDs of an output folder to the rank store.")
+    parser.add_argument("-d", "--bdirs", action="store", dest="benchFilePath", default=os.path.join(".", "output")
+                        , help="path to the benchmark folders. Default: ./output")
+    parser.add_argument("-s", "--store", action="store", dest="storePath", default=""
+                        , help="path of the rank store. Default: <bdirs>/benchmarks.sqlite")
+    args = parser.parse_args()
+
+    storePath = args.storePath if args.storePath != "" else os.path.join(args.benchFilePath, "benchmarks.sqlite")
+    store = openStore(storePath)
+    added = updateStore(store, args.benchFilePath)
+    print("Added %d callIDs to %s (%d stored): %s" % (len(added), storePath, len(storedCallIDs(store)), " ".join(added)))
+    store.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
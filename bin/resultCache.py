@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import shlex
+import shutil
+import hashlib
+from subprocess import check_output
+from subprocess import STDOUT
+from subprocess import CalledProcessError
+
+from jobManifest import fileChecksum
+
+########################################################################################################################
+#                                                                                                                      #
+#                 Content-addressed cache of IntaRNA outputs, shared by all callIDs using the same cache folder.       #
+#          The key covers the IntaRNA binary, the normalized IntaRNA arguments and the contents of all input files.    #
+#                     Entries are evicted least-recently-used first once the cache exceeds its size limit.            #
+#                                                                                                                      #
+########################################################################################################################
+
+# Arguments that do not change the output of IntaRNA
+ignoredArguments = ["--threads"]
+
+# Checksums of input files, each file is hashed only once per run
+checksumMemo = dict()
+
+
+# Identity of the IntaRNA binary: checksum of the executable and its reported version
+def binaryIdentity(intaRNAbinary):
+    try:
+        version = check_output([intaRNAbinary, "--version"], stderr=STDOUT).decode("utf-8").strip()
+    except (CalledProcessError, OSError):
+        version = ""
+    return "%s|%s" % (fileChecksum(intaRNAbinary), version)
+
+
+# Bring the IntaRNA arguments into a canonical form: "--opt value" becomes "--opt=value",
+# arguments without influence on the output are removed and the remaining ones are sorted.
+def normalizeArguments(cmdLineArgs):
+    tokens = shlex.split(cmdLineArgs)
+    normalized = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        # an option followed by a value (values may be negative numbers, but never start like an option)
+        if token.startswith("-") and "=" not in token and i + 1 < len(tokens) \
+                and not re.match(r"^--?[A-Za-z]", tokens[i + 1]):
+            token += "=" + tokens[i + 1]
+            i += 1
+        if token.split("=")[0] not in ignoredArguments:
+            normalized.append(token)
+        i += 1
+    return sorted(normalized)
+
+
+# Checksum of an input file (memoized)
+def inputChecksum(path):
+    if path not in checksumMemo:
+        checksumMemo[path] = fileChecksum(path)
+    return checksumMemo[path]
+
+
+# Compute the cache key of an IntaRNA call from the binary identity, the arguments and the input files
+def cacheKey(binaryId, cmdLineArgs, inputFiles):
+    sha = hashlib.sha256()
+    sha.update(binaryId.encode("utf-8"))
+    sha.update("\0".join(normalizeArguments(cmdLineArgs)).encode("utf-8"))
+    for path in inputFiles:
+        sha.update(b"\0" + inputChecksum(path).encode("utf-8"))
+    return sha.hexdigest()
+
+
+# Paths of the cached output and its metadata for the given key
+def entryPaths(cacheFolder, key):
+    return os.path.join(cacheFolder, key[:2], key + ".csv"), os.path.join(cacheFolder, key[:2], key + ".json")
+
+
+# Link (or copy, if linking is not possible) a file to its destination, replacing an existing file
+def linkOrCopy(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+# Look up a call in the cache. On a hit the cached output is placed at outputFile.
+# return: the stored metadata (including time and memory of the original call), None on a miss
+def fetchResult(cacheFolder, key, outputFile):
+    entry, metaFile = entryPaths(cacheFolder, key)
+    try:
+        with open(metaFile) as f:
+            meta = json.load(f)
+        if fileChecksum(entry) != meta["checksum"]:
+            return None
+        linkOrCopy(entry, outputFile)
+    except (OSError, ValueError, KeyError):
+        return None
+    # the metadata file keeps the time of the last use (eviction order)
+    os.utime(metaFile)
+    return meta
+
+
+# Store the output of a finished call in the cache, published atomically for concurrent callIDs
+def storeResult(cacheFolder, key, outputFile, meta):
+    entry, metaFile = entryPaths(cacheFolder, key)
+    if not os.path.exists(outputFile) or os.path.exists(metaFile):
+        return
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmpSuffix = ".tmp%d" % os.getpid()
+    linkOrCopy(outputFile, entry + tmpSuffix)
+    os.replace(entry + tmpSuffix, entry)
+    meta = dict(meta, checksum=fileChecksum(entry))
+    with open(metaFile + tmpSuffix, "w") as f:
+        json.dump(meta, f)
+    os.replace(metaFile + tmpSuffix, metaFile)
+
+
+# Remove least recently used entries until the cache is smaller than maxBytes
+def evictCache(cacheFolder, maxBytes):
+    entries = []
+    totalSize = 0
+    for root, dirs, files in os.walk(cacheFolder):
+        for file in files:
+            if file.endswith(".json"):
+                metaFile = os.path.join(root, file)
+                entry = metaFile[:-len(".json")] + ".csv"
+                size = os.path.getsize(entry) if os.path.exists(entry) else 0
+                entries.append((os.path.getmtime(metaFile), size, entry, metaFile))
+                totalSize += size
+
+    for lastUse, size, entry, metaFile in sorted(entries):
+        if totalSize <= maxBytes:
+            break
+        for path in [metaFile, entry]:
+            if os.path.exists(path):
+                os.remove(path)
+        totalSize -= size
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import json
+
+from jobManifest import loadManifest, manifestFileName
+from intarnaOutput import compressionEndings, compressionOf, tableFileNames
+
+########################################################################################################################
+#                                                                                                                      #
+#        Catalog of the result files of all callIDs in an output folder: each IntaRNA output with its callID, sRNA,    #
+#     organism, target file, format (compression), size and modification time, and the tables of each callID.          #
+#     The catalog is persisted in the output folder (.catalog.json), only callID folders that changed since the last   #
+#                  scan (the folder or one of its cataloged files) are scanned again.                                  #
+#                                                                                                                      #
+########################################################################################################################
+
+catalogFileName = ".catalog.json"
+
+# Kind of the tables of a callID folder
+tableKinds = {"runTime.csv": "runTime", "memoryUsage.csv": "memoryUsage", "benchmark.csv": "benchmark",
+              "stragglers.csv": "stragglers"}
+
+
+# The organism of each (srna_name, target_name) output of a callID, taken from its manifest
+def outputOrganisms(callFolder):
+    manifest = loadManifest(callFolder)
+    if manifest is None:
+        return dict()
+    return dict(((entry["srna_name"], entry["target_name"]), entry["organism"]) for entry in manifest["jobs"].values()
+                if "organism" in entry)
+
+
+# Scan a callID folder
+# return: list of catalog entries (kind "output" for IntaRNA outputs, otherwise the kind of the table)
+def scanCallID(outputPath, callID):
+    callFolder = os.path.join(outputPath, callID)
+    organisms = None
+    entries = []
+    with os.scandir(callFolder) as files:
+        for file in files:
+            if not file.is_file() or file.name.endswith(".tmp"):
+                continue
+            stat = file.stat()
+            entry = {"callID": callID, "file": file.name, "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                     "format": compressionOf(file.name)}
+            if file.name in tableFileNames:
+                entry["kind"] = tableKinds.get(file.name, "table")
+            elif file.name.endswith(".csv" + compressionEndings[entry["format"]]) and "_" in file.name:
+                # (srna)_(target).csv, the organism is recorded in the manifest (the target name for older callIDs)
+                if organisms is None:
+                    organisms = outputOrganisms(callFolder)
+                srna, target = file.name[:-len(".csv" + compressionEndings[entry["format"]])].split("_", 1)
+                entry.update({"kind": "output", "srna": srna, "target": target,
+                              "organism": organisms.get((srna, target), target)})
+            else:
+                continue
+            entries.append(entry)
+    return sorted(entries, key=lambda x: x["file"])
+
+
+# Whether the cataloged files of a callID folder are unchanged, files rewritten in place (e.g. compressed or
+# truncated outputs) keep the folder modification time
+def isUnchanged(outputPath, callID, entries):
+    for entry in entries:
+        try:
+            stat = os.stat(os.path.join(outputPath, callID, entry["file"]))
+        except OSError:
+            return False
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime"]:
+            return False
+    return True
+
+
+# Load the catalog of an output folder, callID folders that were added, removed or changed are (re)scanned
+# and the updated catalog is persisted. Only folders with a manifest or result files are callIDs (e.g. the
+# ED cache of the output folder is not).
+# return: dictionary callID -> {"mtime": modification time of the folder, "entries": catalog entries}
+def loadCatalog(outputPath):
+    path = os.path.join(outputPath, catalogFileName)
+    catalog = dict()
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                catalog = json.load(f)
+        except ValueError:
+            catalog = dict()
+
+    current = dict()
+    changed = False
+    with os.scandir(outputPath) as folders:
+        for folder in folders:
+            if not folder.is_dir() or folder.name.startswith("."):
+                continue
+            mtime = folder.stat().st_mtime_ns
+            if folder.name in catalog and catalog[folder.name]["mtime"] == mtime \
+                    and isUnchanged(outputPath, folder.name, catalog[folder.name]["entries"]):
+                current[folder.name] = catalog[folder.name]
+                continue
+            entries = scanCallID(outputPath, folder.name)
+            if entries != [] or os.path.exists(os.path.join(folder.path, manifestFileName)):
+                current[folder.name] = {"mtime": mtime, "entries": entries}
+                changed = True
+
+    if changed or set(current) != set(catalog):
+        try:
+            with open(path + ".tmp.%d" % os.getpid(), "w") as f:
+                json.dump(current, f, sort_keys=True)
+            os.replace(path + ".tmp.%d" % os.getpid(), path)
+        except OSError:
+            # a read-only output folder is scanned on every load
+            pass
+    return current
+
+
+# Query the catalog of an output folder
+# callIDs: the callIDs to search (all if None), kind: kind of the files ("output", "benchmark", "runTime", ...)
+# srnas, organisms: restrict outputs to these sRNAs / organisms (None for all)
+# return: list of catalog entries, each with its full "path", ordered by callID and file name
+def findResults(outputPath, callIDs=None, kind="output", srnas=None, organisms=None, catalog=None):
+    catalog = loadCatalog(outputPath) if catalog is None else catalog
+    results = []
+    for callID in sorted(catalog if callIDs is None else callIDs):
+        for entry in catalog.get(callID, {"entries": []})["entries"]:
+            if entry["kind"] != kind or (srnas is not None and entry.get("srna") not in srnas) \
+                    or (organisms is not None and entry.get("organism") not in organisms):
+                continue
+            results.append(dict(entry, path=os.path.join(outputPath, callID, entry["file"])))
+    return results
+
+
+# The callIDs of an output folder that hold files of the given kind (e.g. all benchmarked callIDs)
+def catalogCallIDs(outputPath, kind="output", catalog=None):
+    catalog = loadCatalog(outputPath) if catalog is None else catalog
+    return sorted(callID for callID, folder in catalog.items() if any(x["kind"] == kind for x in folder["entries"]))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="List the result files of the callIDs in an output folder.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder containing the callID folders. Default: ./output")
+    parser.add_argument("-c", "--callID", nargs="*", dest="callIDs", default=None
+                        , help="the callIDs to list. Default: all callIDs")
+    parser.add_argument("-k", "--kind", action="store", dest="kind", default="output"
+                        , help="the kind of files listed: output, benchmark, runTime, memoryUsage or stragglers. Default: output")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.outputPath):
+        sys.exit("Error!!! The output folder %s does not exist!" % args.outputPath)
+
+    print("callID;srna;organism;target;format;size;mtime;path")
+    for entry in findResults(args.outputPath, args.callIDs, args.kind):
+        print("%s;%s;%s;%s;%s;%d;%d;%s" % (entry["callID"], entry.get("srna", ""), entry.get("organism", ""),
+                                           entry.get("target", ""), entry["format"], entry["size"], entry["mtime"],
+                                           entry["path"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import json
+import time
+import fcntl
+import threading
+from itertools import groupby
+
+########################################################################################################################
+#                                                                                                                      #
+#          Append-only run journal of a callID (journal.jsonl): one JSON entry per registered call and state change.   #
+#       Entries are buffered and committed in batches, each batch with a single append under an exclusive file lock.   #
+#               calls.txt, runTime.csv and memoryUsage.csv are views generated from the journal.                       #
+#           Called as script, the views of a callID are regenerated (e.g. after an interrupted run).                   #
+#                                                                                                                      #
+########################################################################################################################
+
+journalFileName = "journal.jsonl"
+
+
+# Open the journal of a callID folder for appending
+# batchSize, interval: a batch is committed once it holds batchSize entries or interval seconds passed since the last one
+def openJournal(callFolder, batchSize=64, interval=2.0):
+    return {"path": os.path.join(callFolder, journalFileName), "buffer": [], "lock": threading.Lock(),
+            "batchSize": batchSize, "interval": interval, "lastCommit": time.monotonic()}
+
+
+# Add entries to the journal, committing the batch if it is due
+def appendJournal(journal, entries):
+    with journal["lock"]:
+        now = time.time()
+        journal["buffer"].extend(dict(entry, time=round(now, 3)) for entry in entries)
+        if len(journal["buffer"]) >= journal["batchSize"] or time.monotonic() - journal["lastCommit"] >= journal["interval"]:
+            commitJournal(journal)
+
+
+# Commit all buffered entries with a single append, other writers are excluded by an exclusive lock on the journal file
+def commitJournal(journal):
+    if journal["buffer"] != []:
+        data = "".join(json.dumps(entry, sort_keys=True) + "\n" for entry in journal["buffer"])
+        with open(journal["path"], "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            fcntl.flock(f, fcntl.LOCK_UN)
+        journal["buffer"] = []
+    journal["lastCommit"] = time.monotonic()
+
+
+# Commit the entries that are still buffered
+def flushJournal(journal):
+    with journal["lock"]:
+        commitJournal(journal)
+
+
+# Read all entries of a journal file (from the given byte offset on). A line cut off by a killed writer is skipped.
+def readJournal(path, offset=0):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        f.seek(offset)
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+# The latest registration and state of each call of a journal.
+# A registration resets the state of a call (--resume registers all calls again, reused calls are journaled as done).
+# return: list of registrations in call order, dictionary call key -> state fields
+def callStates(entries):
+    registered = dict()
+    states = dict()
+    for entry in entries:
+        if entry["event"] == "register":
+            registered[entry["key"]] = entry
+            states[entry["key"]] = {"state": "pending"}
+        elif entry["event"] == "job":
+            states.setdefault(entry["key"], dict()).update((x, y) for x, y in entry.items()
+                                                           if x not in ["event", "key", "time"])
+    return list(registered.values()), states
+
+
+# The runtime (user time in seconds) and memory usage (max RSS in kilobytes) of a call ("NA" unless it finished)
+def callStats(state):
+    if state.get("state") != "done" or state.get("resources") is None:
+        return "NA", "NA"
+    return "%.2f" % state["resources"]["userTime"], str(state["resources"]["maxRSS"])
+
+
+# Write a view atomically
+def writeView(path, lines):
+    with open(path + ".tmp", "w") as f:
+        for line in lines:
+            print(line, file=f)
+    os.replace(path + ".tmp", path)
+
+
+# Generate calls.txt and the time and memory tables (one row per organism and target file with one column per query)
+# of a callID from its journal. The parts of a sharded call are reported with their summed time and peak memory.
+def writeViews(callID, callFolder, journal=None):
+    if journal is not None:
+        flushJournal(journal)
+    registered, states = callStates(readJournal(os.path.join(callFolder, journalFileName)))
+
+    # the queries of a batch share one call, it is listed once
+    writeView(os.path.join(callFolder, "calls.txt"), list(dict.fromkeys(entry["call"] for entry in registered)))
+
+    timeLines = []
+    memoryLines = []
+    for (organism, target_name), group in groupby(registered, key=lambda x: (x["organism"], x["target_name"])):
+        header = "callID;target_name;Organism"
+        timeLine = "%s;%s;%s" % (callID, target_name, organism)
+        memoryLine = "%s;%s;%s" % (callID, target_name, organism)
+
+        for srna_name, parts in groupby(group, key=lambda x: x["srna_name"]):
+            stats = [callStats(states[entry["key"]]) for entry in parts]
+            header += ";%s" % srna_name
+            timeCall, maxMemory = "NA", "NA"
+            if all(stat[0] != "NA" for stat in stats):
+                timeCall = "%.2f" % sum(float(stat[0]) for stat in stats)
+                maxMemory = str(max(int(stat[1]) for stat in stats))
+            # Time in seconds
+            timeLine += ";" + timeCall
+            # Maximum resident set size in kilobyte
+            memoryLine += ";" + maxMemory
+
+        # the header is only printed once
+        if timeLines == []:
+            timeLines.append(header)
+            memoryLines.append(header)
+        timeLines.append(timeLine)
+        memoryLines.append(memoryLine)
+
+    writeView(os.path.join(callFolder, "runTime.csv"), timeLines)
+    writeView(os.path.join(callFolder, "memoryUsage.csv"), memoryLines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Regenerate calls.txt, runTime.csv and memoryUsage.csv of a callID from its journal.")
+    parser.add_argument("-c", "--callID", action="store", dest="callID", default=""
+                        , help="the callID whose views are regenerated.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder containing the callID folder. Default: ./output")
+    args = parser.parse_args()
+
+    if args.callID == "":
+        sys.exit("No callID was specified! Please specify a callID using -c <name> or --callID=<name>")
+    callFolder = os.path.join(args.outputPath, args.callID)
+    if not os.path.exists(os.path.join(callFolder, journalFileName)):
+        sys.exit("Error!!! No journal found for callID %s!" % args.callID)
+
+    writeViews(args.callID, callFolder)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import socket
+import resource
+import threading
+
+from jobManifest import manifestLock
+
+########################################################################################################################
+#                                                                                                                      #
+#            Live telemetry of a running callID: calls done/running/queued/failed, throughput, CPU utilization and     #
+#       the estimated remaining time. It is written periodically into status.json and the Prometheus textfile          #
+#                          status.prom of the callID folder (see status.py for a summary).                             #
+#                                                                                                                      #
+########################################################################################################################
+
+statusFileName = "status.json"
+prometheusFileName = "status.prom"
+
+
+# Start writing the status of a run in the background every interval seconds.
+# keys: the jobs of the run (jobs reused from an earlier run or the cache are counted as reused)
+# cores: the core budget of the run, the CPU utilization is measured against it
+# return: telemetry dictionary for stopTelemetry
+def startTelemetry(callFolder, callID, manifest, keys, cores, interval=10.0):
+    with manifestLock:
+        reused = sum(1 for key in keys if manifest["jobs"][key]["state"] == "done")
+    telemetry = {"callFolder": callFolder, "callID": callID, "manifest": manifest, "keys": keys, "cores": cores,
+                 "interval": interval, "reused": reused, "started": time.time(), "start": time.monotonic(),
+                 "cpuStart": childrenCpuTime(), "stop": threading.Event()}
+
+    def update():
+        while not telemetry["stop"].wait(interval):
+            writeStatus(telemetry)
+
+    writeStatus(telemetry)
+    telemetry["thread"] = threading.Thread(target=update, daemon=True)
+    telemetry["thread"].start()
+    return telemetry
+
+
+# Stop the background updates and write the final status of the run
+def stopTelemetry(telemetry):
+    telemetry["stop"].set()
+    telemetry["thread"].join()
+    writeStatus(telemetry, finished=True)
+
+
+# CPU time (user and system) of all finished child processes in seconds
+def childrenCpuTime():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# The current status of a run
+def runStatus(telemetry, finished=False):
+    with manifestLock:
+        states = [telemetry["manifest"]["jobs"][key]["state"] for key in telemetry["keys"]]
+    counts = dict((state, states.count(state)) for state in ["pending", "running", "done", "failed"])
+    elapsed = time.monotonic() - telemetry["start"]
+    # throughput of the calls run (not reused) in this run
+    doneNow = counts["done"] - telemetry["reused"]
+    jobsPerMinute = doneNow / (elapsed / 60) if elapsed > 0 else 0.0
+    remaining = counts["pending"] + counts["running"]
+    eta = remaining / jobsPerMinute * 60 if jobsPerMinute > 0 else None
+    cpuUtilization = (childrenCpuTime() - telemetry["cpuStart"]) / (elapsed * telemetry["cores"]) if elapsed > 0 else 0.0
+    return {"callID": telemetry["callID"], "host": socket.gethostname(), "pid": os.getpid(),
+            "state": "finished" if finished else "running", "started": round(telemetry["started"], 3),
+            "updated": round(time.time(), 3), "interval": telemetry["interval"], "elapsed": round(elapsed, 3),
+            "jobs": {"total": len(states), "done": counts["done"], "running": counts["running"],
+                     "queued": counts["pending"], "failed": counts["failed"], "reused": telemetry["reused"]},
+            "jobsPerMinute": round(jobsPerMinute, 3), "cpuUtilization": round(cpuUtilization, 4),
+            "cores": telemetry["cores"], "eta": round(eta, 1) if eta is not None else None}
+
+
+# Prometheus text exposition of a status (for the textfile collector of the node exporter)
+def prometheusText(status):
+    label = 'callid="%s"' % status["callID"].replace("\\", "\\\\").replace('"', '\\"')
+    lines = ["# HELP intarna_benchmark_jobs IntaRNA calls of the callID by state.",
+             "# TYPE intarna_benchmark_jobs gauge"]
+    for state in ["done", "running", "queued", "failed", "reused"]:
+        lines.append('intarna_benchmark_jobs{%s,state="%s"} %d' % (label, state, status["jobs"][state]))
+    metrics = [("jobs_total", "Number of IntaRNA calls of the callID.", status["jobs"]["total"]),
+               ("jobs_per_minute", "Finished IntaRNA calls per minute.", status["jobsPerMinute"]),
+               ("cpu_utilization", "CPU time of the finished calls per core and second.", status["cpuUtilization"]),
+               ("eta_seconds", "Estimated remaining time of the run in seconds (-1 if unknown).",
+                status["eta"] if status["eta"] is not None else -1),
+               ("finished", "1 if the run finished.", int(status["state"] == "finished")),
+               ("last_update_timestamp_seconds", "Time of the last status update.", status["updated"])]
+    for name, description, value in metrics:
+        lines.append("# HELP intarna_benchmark_%s %s" % (name, description))
+        lines.append("# TYPE intarna_benchmark_%s gauge" % name)
+        lines.append("intarna_benchmark_%s{%s} %s" % (name, label, value))
+    return "\n".join(lines) + "\n"
+
+
+# Write status.json and status.prom of a run atomically
+def writeStatus(telemetry, finished=False):
+    status = runStatus(telemetry, finished)
+    for fileName, content in [(statusFileName, json.dumps(status, indent=1, sort_keys=True) + "\n"),
+                              (prometheusFileName, prometheusText(status))]:
+        path = os.path.join(telemetry["callFolder"], fileName)
+        with open(path + ".tmp", "w") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
@@ -1,5 +1,4 @@
 #!/usr/bin/env python
-import os
 import argparse
 import pandas as pd
 import collections
@@ -11,6 +10,8 @@ import re
 from operator import itemgetter
 import math
 
+from resultCatalog import findResults
+
 def natural_sort(l, key):
     """
     sort the way human expect the sorting (alpha-numerically)
@@ -20,12 +21,10 @@ def natural_sort(l, key):
     return sorted(l, key = alphanum_key)
 
 def screen_files(args):
-    file_paths = []
-    for root, dirs, files in os.walk(args.input_folder):
-        for file in files:
-            if file == "benchmark.csv":
-                 file_paths.append(os.path.join(root, file))
-    return file_paths
+    """
+    the benchmark files of all callIDs in the input folder (from the result catalog)
+    """
+    return [entry["path"] for entry in findResults(args.input_folder, kind="benchmark")]
 
 def create_hits_table(file_paths):
     results = []
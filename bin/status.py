@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import json
+import glob
+import time
+import socket
+
+from runStatus import statusFileName
+from costModel import formatDuration
+
+########################################################################################################################
+#                                                                                                                      #
+#                  Summarize the progress of the callIDs in an output folder from their status.json:                   #
+#                     calls done/running/queued/failed, throughput, CPU utilization and remaining time.                #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Whether the run of a status is still alive. A run on this host is checked by its process, a run on another host
+# is considered alive as long as it updated its status recently.
+def isAlive(status):
+    if status["state"] != "running":
+        return False
+    if status["host"] == socket.gethostname():
+        try:
+            os.kill(status["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+    return time.time() - status["updated"] < 3 * status["interval"] + 60
+
+
+# The status of all callIDs in the output folder
+# return: list of status dictionaries (with "alive" set)
+def readStatuses(outputPath):
+    statuses = []
+    for path in sorted(glob.glob(os.path.join(outputPath, "*", statusFileName))):
+        try:
+            with open(path) as f:
+                status = json.load(f)
+        except ValueError:
+            continue
+        status["alive"] = isAlive(status)
+        statuses.append(status)
+    return statuses
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Summarize the progress of running callIDs.")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder containing the callID folders. Default: ./output")
+    parser.add_argument("-a", "--all", action="store_true", dest="all", default=False
+                        , help="When set finished and stalled callIDs are shown as well.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.outputPath):
+        sys.exit("Error!!! The output folder %s does not exist!" % args.outputPath)
+
+    statuses = [x for x in readStatuses(args.outputPath) if args.all or x["alive"]]
+    if statuses == []:
+        print("No %scallIDs found in %s!" % ("" if args.all else "running ", args.outputPath))
+        return
+
+    print("callID;state;done;running;queued;failed;total;jobs/min;cpu;elapsed;eta")
+    for status in statuses:
+        state = "running" if status["alive"] else ("finished" if status["state"] == "finished" else "stalled")
+        jobs = status["jobs"]
+        print("%s;%s;%d;%d;%d;%d;%d;%.1f;%.0f%%;%s;%s" % (status["callID"], state, jobs["done"], jobs["running"],
+                                                       jobs["queued"], jobs["failed"], jobs["total"],
+                                                       status["jobsPerMinute"], 100 * status["cpuUtilization"],
+                                                       formatDuration(status["elapsed"]),
+                                                       formatDuration(status["eta"]) if status["eta"] is not None
+                                                       and state == "running" else "NA"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+import sys, argparse
+import os
+import re
+import glob
+import shlex
+import shutil
+from itertools import product, groupby
+from functools import partial
+
+from jobExecutor import runSubprocess, runJobs, runJobsWithinMemory
+from jobBundle import loadTasks, runTask
+from ingestBundle import ingestBundle
+from costModel import callFeatures, loadHistory, createMemoryModel, predictMemory, observeMemory
+from mergeBenchmarks import mergeBenchmarks, mergeLogFiles
+from intarnaOutput import compressionEndings
+from targetShards import splitTargetFile
+
+########################################################################################################################
+#                                                                                                                      #
+#               Run a parameter sweep: many IntaRNA configurations (a grid or a list) as one scheduled campaign.       #
+#        Each configuration becomes a callID. The calls of all configurations are prepared as job bundles (sharing     #
+#       the ED cache), run in one global queue and collected into callID folders with their benchmark as soon as       #
+#                  they finish. Finally the benchmarks, time and memory tables of the sweep are merged.                #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Turn IntaRNA arguments into a valid part of a callID
+def argumentTag(argument):
+    return re.sub(r"[^A-Za-z0-9.+-]", "", argument.lstrip("-").replace("=", "").replace(" ", ""))
+
+
+# The configurations of a grid: every combination of the values of the given "option=value1,value2,..." entries
+# (the option is given without leading dashes, otherwise it would be taken as an argument of the sweep)
+# return: list of (callID, IntaRNA arguments)
+def gridConfigurations(prefix, grid):
+    axes = []
+    for entry in grid:
+        if "=" not in entry:
+            sys.exit("Error!!! Grid entries have to be given as <option>=<value1>,<value2>,... : %s" % entry)
+        option, values = entry.split("=", 1)
+        axes.append(["--" + option.lstrip("-") + "=" + value for value in values.split(",")])
+
+    return [(prefix + "_" + "_".join(argumentTag(x) for x in combination), " ".join(combination))
+            for combination in product(*axes)]
+
+
+# The configurations of a list file, one configuration per line: "<callID>;<IntaRNA arguments>" or "<IntaRNA arguments>".
+# Empty lines and lines starting with # are skipped.
+# return: list of (callID, IntaRNA arguments)
+def listConfigurations(prefix, listFile):
+    configurations = []
+    with open(listFile) as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            if ";" in line:
+                callID, arguments = [x.strip() for x in line.split(";", 1)]
+            else:
+                callID, arguments = "%s_%d" % (prefix, len(configurations) + 1), line
+            configurations.append((callID, arguments))
+    return configurations
+
+
+# Split the target files of all organisms once for all configurations into shardFolder (in the layout of calls.py)
+def prepareShards(inputPath, nShards, shardFolder):
+    fastaFileEndings = [".fasta", ".fa"]
+    for organism in sorted(x for x in os.listdir(inputPath) if os.path.isdir(os.path.join(inputPath, x))):
+        for ending in fastaFileEndings:
+            for target_file in sorted(glob.glob(os.path.join(inputPath, organism, "target", "*" + ending))):
+                target_name = os.path.basename(os.path.splitext(target_file)[0])
+                splitTargetFile(target_file, nShards, os.path.join(shardFolder, organism, target_name))
+
+
+# Prepare the job bundle of one configuration with calls.py (shared shards and ED-values of the ED cache included)
+def prepareBundle(args, bundleFolder, callID, arguments, logPrefix, shardFolder):
+    callArgs = ["python3", os.path.join(os.path.dirname(os.path.abspath(__file__)), "calls.py"),
+                "-b", args.intaRNAbinary, "-i", args.inputPath, "-o", args.outputPath, "-c", callID,
+                "--bundle", bundleFolder, "-j", str(args.jobs), "--cores", str(args.cores), "-s", str(args.shards),
+                "--shardFolder", shardFolder, "-m", args.maxInteractionLength, "--compress", args.compression,
+                "--timeout", str(args.timeout), "--memoryLimit", str(args.memoryLimit), "--retries", str(args.retries),
+                "--retryDelay", str(args.retryDelay), "--retryMemoryFactor", str(args.retryMemoryFactor),
+                "--topK", str(args.topK)]
+    if args.enabledTargetED:
+        callArgs.append("-e")
+    runSubprocess(callArgs + shlex.split(arguments, posix=False), logPrefix)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Run a parameter sweep of IntaRNA configurations. IntaRNA arguments common to all configurations can be "
+                    "added at the end of the call. python3 sweep.py -p <prefix> -g <option>=<v1>,<v2> --<IntaRNA arguments>")
+    parser.add_argument("-b", "--intaRNAbinary", action="store", dest="intaRNAbinary",
+                        default=os.path.join("..", "IntaRNA", "src", "bin", "IntaRNA")
+                        , help="the location of the intaRNA executable. Default: ../IntaRNA/src/bin .")
+    parser.add_argument("-i", "--infile", action="store", dest="inputPath", default=os.path.join(".", "input")
+                        , help="input folder containing the required fasta files. Default: ./input")
+    parser.add_argument("-o", "--outfile", action="store", dest="outputPath", default=os.path.join(".", "output")
+                        , help="location of the output folder.")
+    parser.add_argument("-p", "--prefix", action="store", dest="prefix", default=""
+                        , help="a mandatory name of the sweep, used as prefix of the generated callIDs.")
+    parser.add_argument("-g", "--grid", nargs="*", dest="grid", default=[]
+                        , help="IntaRNA options (without dashes) with the values to sweep: <option>=<value1>,<value2>,... "
+                               "All combinations are run.")
+    parser.add_argument("-l", "--list", action="store", dest="listFile", default=""
+                        , help="file with one configuration per line: <callID>;<IntaRNA arguments> (the callID is optional).")
+    parser.add_argument("-r", "--result", action="store", dest="resultFile", default=""
+                        , help="path and name of the merged benchmark. Default: ./<prefix>_benchmark.csv")
+    parser.add_argument("-v", "--verified", action="store", dest="verified_interactions", default="./verified_interactions.csv"
+                        , help="The path to the file containing the verified interactions.")
+    parser.add_argument("-e", "--withTargetED", action="store_true", dest="enabledTargetED", default=False
+                        , help="Target ED-values are precomputed once per accessibility setting and shared by all configurations.")
+    parser.add_argument("-m", "--maxInteractionLength", action="store", dest="maxInteractionLength", default="150"
+                        , help="The maximum interaction length used in the precomputation of the target ED values.")
+    parser.add_argument("-j", "--jobs", action="store", dest="jobs", default=1, type=int
+                        , help="The number of IntaRNA calls running at the same time, over all configurations. Default: 1")
+    parser.add_argument("--cores", action="store", dest="cores", default=0, type=int
+                        , help="The number of cores shared by all concurrent calls (see calls.py). Default: --jobs")
+    parser.add_argument("-s", "--shards", action="store", dest="shards", default=1, type=int
+                        , help="Split each target file into this many length-balanced shards. Default: 1")
+    parser.add_argument("--memoryBudget", action="store", dest="memoryBudget", default=0, type=float
+                        , help="Memory of the node in gigabytes, shared by the concurrent calls of all configurations. "
+                               "Default: 0 (no memory limit)")
+    parser.add_argument("--compress", action="store", dest="compression", default="none", choices=list(compressionEndings)
+                        , help="Store the IntaRNA outputs compressed (see calls.py). Default: none")
+    parser.add_argument("--timeout", action="store", dest="timeout", default=0, type=float
+                        , help="Wall time limit of each IntaRNA call in seconds (see calls.py). Default: 0 (no limit)")
+    parser.add_argument("--memoryLimit", action="store", dest="memoryLimit", default=0, type=float
+                        , help="Address space limit of each IntaRNA call in gigabytes (see calls.py). Default: 0 (no limit)")
+    parser.add_argument("--retries", action="store", dest="retries", default=0, type=int
+                        , help="Number of retries of failed calls (see calls.py). Default: 0")
+    parser.add_argument("--retryDelay", action="store", dest="retryDelay", default=10, type=float
+                        , help="Delay before the first retry in seconds (see calls.py). Default: 10")
+    parser.add_argument("--retryMemoryFactor", action="store", dest="retryMemoryFactor", default=2, type=float
+                        , help="Factor the memory limit is raised by when retrying a call that ran out of memory "
+                               "(see calls.py). Default: 2")
+    parser.add_argument("--topK", action="store", dest="topK", default=0, type=int
+                        , help="Keep only the interactions of the K lowest energy classes in each output (see calls.py). "
+                               "Default: 0 (keep all)")
+    parser.add_argument("--keepBundles", action="store_true", dest="keepBundles", default=False
+                        , help="Keep the job bundles of the configurations after collecting their results.")
+    args, cmdLineArgs = parser.parse_known_args()
+
+    # Remaining argument options are used for IntaRNA in all configurations
+    commonArgs = " ".join(cmdLineArgs)
+
+    if args.prefix == "":
+        sys.exit("No sweep name was specified! Please specify a prefix using -p <name>")
+    if args.grid == [] and args.listFile == "":
+        sys.exit("Error!!! No configurations given! Please specify a grid (-g) and/or a list file (-l).")
+    if not os.path.exists(args.intaRNAbinary):
+        sys.exit("Error!!! IntaRNA filePath does not exist! Please specify it using -b <intaRNAbinary>!")
+
+    # The bundles hold absolute paths, the outputs are collected into the output folder afterwards
+    args.intaRNAbinary = os.path.abspath(args.intaRNAbinary)
+    args.inputPath = os.path.abspath(args.inputPath)
+    args.outputPath = os.path.abspath(args.outputPath)
+    resultFile = args.resultFile if args.resultFile != "" else os.path.join(".", args.prefix + "_benchmark.csv")
+
+    configurations = []
+    if args.grid != []:
+        configurations += gridConfigurations(args.prefix, args.grid)
+    if args.listFile != "":
+        configurations += listConfigurations(args.prefix, args.listFile)
+    configurations = [(callID, (arguments + " " + commonArgs).strip()) for callID, arguments in configurations]
+
+    # Check the callIDs before anything is computed
+    callIDs = [callID for callID, _ in configurations]
+    if len(set(callIDs)) != len(callIDs):
+        sys.exit("Error!!! The sweep contains duplicate callIDs: %s" % sorted(set(x for x in callIDs if callIDs.count(x) > 1)))
+    for callID in callIDs:
+        if os.path.exists(os.path.join(args.outputPath, callID)):
+            sys.exit("Error!!! A directory for callID %s already exists!" % callID)
+
+    # the hidden sweep folder is ignored by the scripts iterating over the callID folders
+    sweepFolder = os.path.join(args.outputPath, "." + args.prefix + "-sweep")
+    if os.path.exists(sweepFolder):
+        sys.exit("Error!!! The sweep folder %s already exists!" % sweepFolder)
+    os.makedirs(sweepFolder)
+    with open(resultFile[:-len(".csv")] + "_configurations.csv", "w") as f:
+        print("callID;arguments", file=f)
+        for callID, arguments in configurations:
+            print("%s;%s" % (callID, arguments), file=f)
+
+    # Prepare all configurations. The target files are split once and the shards are shared by all configurations,
+    # ED-values are computed only for the first configuration of each accessibility setting and taken from the ED cache
+    # by all others.
+    shardFolder = os.path.join(sweepFolder, "shards")
+    if args.shards > 1:
+        prepareShards(args.inputPath, args.shards, shardFolder)
+    print("Preparing %d configurations!" % len(configurations))
+    for callID, arguments in configurations:
+        prepareBundle(args, os.path.join(sweepFolder, callID), callID, arguments, os.path.join(sweepFolder, "logs", callID),
+                      shardFolder)
+
+    # One global queue over the tasks of all configurations
+    jobs = []
+    for callID, _ in configurations:
+        bundleFolder = os.path.join(sweepFolder, callID)
+        for index, task in enumerate(loadTasks(bundleFolder)):
+            jobs.append(dict(task, callID=callID, bundle=bundleFolder, index=index + 1))
+    print("Running %d calls of %d configurations!" % (len(jobs), len(configurations)))
+
+    runner = lambda job: runTask(job["bundle"], job["index"])
+    if args.memoryBudget > 0:
+        memoryBudget = args.memoryBudget * 1024 ** 2
+        history = loadHistory(args.outputPath, args.inputPath, "memoryUsage.csv", commonArgs)
+        model = createMemoryModel(history, default=memoryBudget / max(1, args.jobs))
+        print("Memory model based on %d earlier calls!" % len(history))
+        # the features of each (query, target) pair are computed once for all configurations
+        features = dict()
+        for job in jobs:
+            if (job["query"], job["target"]) not in features:
+                features[(job["query"], job["target"])] = callFeatures(job["query"], job["target"])
+            job["features"] = features[(job["query"], job["target"])]
+        results = runJobsWithinMemory(jobs, args.jobs, memoryBudget, partial(predictMemory, model),
+                                      lambda job, record: observeMemory(model, job, record if record is not None
+                                                                        and record["exitCode"] == 0 else None), runner)
+    else:
+        results = runJobs(jobs, args.jobs, runner=runner)
+
+    # Results arrive in job order: each configuration is collected and benchmarked as soon as its last call finished,
+    # while the calls of the following configurations keep running
+    finished = []
+    for callID, group in groupby(zip(jobs, results), key=lambda x: x[0]["callID"]):
+        records = [record for _, record in group]
+        try:
+            ingestBundle(os.path.join(sweepFolder, callID), args.outputPath, args.verified_interactions)
+        except SystemExit as e:
+            # a configuration without outputs to benchmark does not stop the sweep
+            print(e)
+        if all(record["exitCode"] == 0 for record in records):
+            if not args.keepBundles:
+                shutil.rmtree(os.path.join(sweepFolder, callID))
+        else:
+            print("Calls of %s failed, its bundle is kept in %s!" % (callID, os.path.join(sweepFolder, callID)))
+        finished.append(callID)
+
+    # the shared shards are kept as long as the bundle of a failed configuration refers to them
+    if set(os.listdir(sweepFolder)) <= {"logs", "shards"}:
+        shutil.rmtree(sweepFolder)
+
+    # Merge the benchmarks, time and memory tables of the sweep
+    benchmarked = [callID for callID in finished if os.path.exists(os.path.join(args.outputPath, callID, "benchmark.csv"))]
+    if benchmarked == []:
+        sys.exit("Error!!! No configuration of the sweep was benchmarked!")
+    mergeBenchmarks([os.path.join(args.outputPath, callID, "benchmark.csv") for callID in benchmarked], resultFile)
+    mergeLogFiles(benchmarked, args.outputPath, resultFile)
+    print("Merged the benchmarks of %d configurations into %s!" % (len(benchmarked), resultFile))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
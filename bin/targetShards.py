@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import os
+import heapq
+
+from intarnaOutput import openOutput, compressionOf
+
+########################################################################################################################
+#                                                                                                                      #
+#          Split target multi-FASTA files into length-balanced shards and merge the IntaRNA outputs of the shards.     #
+#                    The shards of one target file can be processed in parallel by independent IntaRNA calls.           #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Iterate over the records of a FASTA file without loading the whole file
+# return: generator of (header line, list of sequence lines)
+def readFastaRecords(fastaFile):
+    header = None
+    lines = []
+    with open(fastaFile) as fasta:
+        for line in fasta:
+            if line.startswith(">"):
+                if header is not None:
+                    yield header, lines
+                header = line
+                lines = []
+            elif header is not None and line.strip() != "":
+                lines.append(line if line.endswith("\n") else line + "\n")
+    if header is not None:
+        yield header, lines
+
+
+# Assign each record to one of nShards shards, such that the summed sequence lengths of the shards are balanced.
+# Longest records are placed first, always into the currently lightest shard (LPT scheduling).
+# return: list with the shard index of each record (in file order)
+def balanceShards(recordLengths, nShards):
+    heap = [(0, shard) for shard in range(nShards)]
+    assignment = [0] * len(recordLengths)
+    for idx in sorted(range(len(recordLengths)), key=lambda i: -recordLengths[i]):
+        load, shard = heapq.heappop(heap)
+        assignment[idx] = shard
+        heapq.heappush(heap, (load + recordLengths[idx], shard))
+    return assignment
+
+
+# Split a target FASTA file into at most nShards length-balanced shard files in shardFolder.
+# Records keep their original order within a shard. Existing shard files are reused, as the split is deterministic.
+# return: list of shard file paths
+def splitTargetFile(targetFile, nShards, shardFolder):
+    # a complete split into nShards shards is reused without reading the target file
+    shardFiles = [os.path.join(shardFolder, "shard%dof%d.fa" % (i + 1, nShards)) for i in range(nShards)]
+    if all(os.path.exists(x) for x in shardFiles):
+        return shardFiles
+
+    recordLengths = [sum(len(l.strip()) for l in lines) for _, lines in readFastaRecords(targetFile)]
+    nShards = max(1, min(nShards, len(recordLengths)))
+    shardFiles = [os.path.join(shardFolder, "shard%dof%d.fa" % (i + 1, nShards)) for i in range(nShards)]
+    if all(os.path.exists(x) for x in shardFiles):
+        return shardFiles
+
+    if not os.path.exists(shardFolder):
+        os.makedirs(shardFolder)
+
+    assignment = balanceShards(recordLengths, nShards)
+    handles = [open(x + ".tmp", "w") for x in shardFiles]
+    try:
+        for shard, (header, lines) in zip(assignment, readFastaRecords(targetFile)):
+            handles[shard].write(header)
+            handles[shard].writelines(lines)
+    finally:
+        for handle in handles:
+            handle.close()
+    # only publish complete shard files
+    for shardFile in shardFiles:
+        os.replace(shardFile + ".tmp", shardFile)
+    return shardFiles
+
+
+# Concatenate the CSV outputs (--outMode C) of all shards into one output file, line by line.
+# The header is taken once from the first non-empty shard output, the shard outputs are removed afterwards.
+# Compressed shard outputs are merged into an output file with the same compression.
+def mergeShardOutputs(shardOutputs, outputFile):
+    header = None
+    with openOutput(outputFile + ".tmp", "wt", compressionOf(outputFile)) as merged:
+        for shardOutput in shardOutputs:
+            if not os.path.exists(shardOutput):
+                continue
+            with openOutput(shardOutput) as shard:
+                shardHeader = shard.readline()
+                if shardHeader == "":
+                    continue
+                if header is None:
+                    header = shardHeader
+                    merged.write(header)
+                for line in shard:
+                    merged.write(line)
+    os.replace(outputFile + ".tmp", outputFile)
+    for shardOutput in shardOutputs:
+        if os.path.exists(shardOutput):
+            os.remove(shardOutput)
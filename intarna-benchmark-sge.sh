@@ -24,9 +24,10 @@ outputPath="./output/"
 intaRNACall=""
 callID=""
 withED=false
+jobs=1
 
 # Handling input
-while getopts "h?s:b:i:o:a:c:e" opt; do
+while getopts "h?s:b:i:o:a:c:j:e" opt; do
     case "$opt" in
     h|\?)
         exit 0
@@ -45,6 +46,8 @@ while getopts "h?s:b:i:o:a:c:e" opt; do
         ;;
     e)  withED=true
         ;;
+    j)  jobs=$OPTARG
+        ;;
     esac
 done
 
@@ -58,7 +61,7 @@ fi
 # Run benchmark
 if [ "$withED" == true ]
 then
-  python3 $scriptsPath/calls.py -b "$intaRNAbinary" -i "$inputPath" -o "$outputPath" -c "$callID" "$intaRNACall" -e
+  python3 $scriptsPath/calls.py -b "$intaRNAbinary" -i "$inputPath" -o "$outputPath" -c "$callID" -j "$jobs" --cores "${NSLOTS:-$jobs}" "$intaRNACall" -e
 else
-  python3 $scriptsPath/calls.py -b "$intaRNAbinary" -i "$inputPath" -o "$outputPath" -c "$callID" "$intaRNACall"
+  python3 $scriptsPath/calls.py -b "$intaRNAbinary" -i "$inputPath" -o "$outputPath" -c "$callID" -j "$jobs" --cores "${NSLOTS:-$jobs}" "$intaRNACall"
 fi
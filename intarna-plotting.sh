@@ -20,16 +20,21 @@ outputPath="./plots/intaRNA.pdf"
 all=false
 referenceID=""
 plotTitle="''"
-delete=false
 additional=false
 config="./config.txt"
 
 # Handling input
-while getopts "h?i:o:c:b:f:t:p:r:f:dam" opt; do
+while getopts "hi:o:c:b:f:t:p:r:f:dam" opt; do
     case "$opt" in
-    h|\?)
+    h)
         exit 0
         ;;
+    \?)
+        echo "Usage: $0 -c <callID> [-c <callID> ...] -r <referenceID> [-i <input>] [-o <output>] [-b <scripts>] [-f <config>] [-t <title>] [-p <plottype>] [-a] [-m]" >&2
+        exit 1
+        ;;
+    d)  echo "Warning: -d is deprecated and ignored, no merged files are written anymore." >&2
+        ;;
     b)  scriptsPath=$OPTARG
         ;;
     i)  inputPath=$OPTARG
@@ -46,8 +51,6 @@ while getopts "h?i:o:c:b:f:t:p:r:f:dam" opt; do
         ;;
     p)  plottype=$OPTARG
         ;;
-    d)  delete=true
-        ;;
     f)  config=$OPTARG
         ;;
     m)  additional=true
@@ -67,29 +70,22 @@ then
   exit;
 fi
 
-# unique output file
-tmpOutput="./tmp/mergedBenchmark_$(date +%Y%m%d%H%M%S).csv"
-mkdir -p ./tmp
+# persistent rank store of all benchmarked callIDs, new or changed callIDs are added incrementally
+store="$inputPath/benchmarks.sqlite"
 mkdir -p ./plots
+python3 $scriptsPath/rankStore.py -d $inputPath -s $store
 
-# merge benchmarks
+# plot only the needed callIDs (all stored callIDs with -a)
 if [ "$all" == true ]
 then
-  python3 $scriptsPath/mergeBenchmarks.py -c ${callIDs[@]} -d $inputPath -o $tmpOutput -a
+  selection=""
 else
-  python3 $scriptsPath/mergeBenchmarks.py -c ${callIDs[@]} -d $inputPath -o $tmpOutput
+  selection="--callIDs ${callIDs[@]}"
 fi
 
-# plot
-if [ "$additional" == true ] 
+if [ "$additional" == true ]
 then
-  python3 $scriptsPath/plot.py -i $tmpOutput --referenceID $referenceID -o $outputPath -t "$plotTitle" --config $config --plottype $plottype --additional
+  python3 $scriptsPath/plot.py --store $store $selection --referenceID $referenceID -o $outputPath -n "$plotTitle" --config $config --plottype $plottype -t -m
 else
-  python3 $scriptsPath/plot.py -i $tmpOutput --referenceID $referenceID -o $outputPath -t "$plotTitle" --config $config --plottype $plottype
-fi
-
-# remove temporary files if wanted
-if [ "$delete" == true ]
-then
-  rm "${tmpOutput%.csv}"*
+  python3 $scriptsPath/plot.py --store $store $selection --referenceID $referenceID -o $outputPath -n "$plotTitle" --config $config --plottype $plottype
 fi
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin"))
+
+from benchmark import outputRanks
+
+########################################################################################################################
+#                                                                                                                      #
+#          The vectorized ranking of benchmark.py gives the ranks of the original prefix scan over the sorted output.  #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Write a toy IntaRNA output (--outMode C) with the given target ids and energies
+def writeOutput(path, ids, energies):
+    with open(path, "w") as f:
+        print("id1;start1;end1;id2;start2;end2;subseqDP;hybridDP;E", file=f)
+        for i, (id1, energy) in enumerate(zip(ids, energies)):
+            print("%s;%d;%d;query;1;8;ACGUACGU&ACGUACGU;((((((((&))))))));%s" % (id1, i + 1, i + 8, energy), file=f)
+
+
+# The rank of a target as computed originally: sort the output by rounded energy and id, count the distinct energies
+# down to the first interaction of the target (sys.maxsize if the target is not in the output)
+def prefixScanRank(path, target_ltag):
+    df = pd.read_csv(path, sep=";", header=0)
+    df = df.round({"E": 2})
+    df = df.sort_values(by=["E", "id1"])
+    try:
+        return len(set(list(df["E"])[0:list(df["id1"]).index(target_ltag) + 1]))
+    except ValueError:
+        return sys.maxsize
+
+
+# A random output with repeated targets and tied (rounded) energies
+def randomOutput(rng, nRows, nTargets):
+    ids = ["b%04d" % x for x in rng.integers(0, nTargets, nRows)]
+    energies = np.round(rng.choice(np.arange(-30, 0, 0.25), nRows) + rng.choice([0, 0.001, -0.004], nRows), 3)
+    return ids, energies
+
+
+class OutputRanksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "sRNA_T.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    # targets missing from the output are left out (ranked sys.maxsize by rankOutput)
+    def assertPrefixScanRanks(self, ltags, topK=0):
+        ranks = outputRanks(self.path, ltags, topK)
+        for ltag in ltags:
+            expected = prefixScanRank(self.path, ltag)
+            if topK == 0:
+                self.assertEqual(ranks.get(ltag, sys.maxsize), expected, ltag)
+            else:
+                self.assertEqual(min(ranks.get(ltag, topK + 1), topK + 1), min(expected, topK + 1), ltag)
+
+    def test_ties_and_repeated_targets(self):
+        writeOutput(self.path, ["b1", "b2", "b3", "b2", "b4", "b5", "b1"],
+                    [-10.004, -10.0, -9.5, -12.0, -9.5, -8.123, -7.0])
+        self.assertEqual(outputRanks(self.path, {"b1", "b2", "b3", "b4", "b5"}),
+                         {"b2": 1, "b1": 2, "b3": 3, "b4": 3, "b5": 4})
+        self.assertPrefixScanRanks(["b1", "b2", "b3", "b4", "b5", "missing"])
+
+    def test_empty_output(self):
+        writeOutput(self.path, [], [])
+        self.assertEqual(outputRanks(self.path, {"b1"}), dict())
+
+    def test_random_outputs(self):
+        rng = np.random.default_rng(17)
+        for nRows, nTargets in [(1, 1), (50, 10), (400, 60), (400, 500)]:
+            ids, energies = randomOutput(rng, nRows, nTargets)
+            writeOutput(self.path, ids, energies)
+            ltags = sorted(set(ids))[::3] + ["missing"]
+            self.assertPrefixScanRanks(ltags)
+            for topK in [1, 5, 20]:
+                self.assertPrefixScanRanks(ltags, topK)
+
+
+if __name__ == "__main__":
+    unittest.main()
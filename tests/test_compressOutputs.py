@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin"))
+
+from jobManifest import createManifest, loadManifest, updateJob, recordOutput, registerJobs, fileChecksum
+from runJournal import commitJournal
+from intarnaOutput import outputName
+from compressOutputs import compressFile, updateManifest
+
+########################################################################################################################
+#                                                                                                                      #
+#            A callID compressed with compressOutputs.py is resumed with calls.py --compress without rerunning calls,   #
+#                                 including the calls of target shards whose outputs were merged.                      #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# The job of a call of a callID as built by calls.py, shards write a part output that is merged into out
+def callJob(callFolder, srna_name, target_name, compression, shard=None):
+    out = outputName(os.path.join(callFolder, srna_name + "_" + target_name + ".csv"), compression)
+    partOut = out
+    if shard is not None:
+        partOut = outputName(os.path.join(callFolder, "shards", "org", target_name,
+                                          srna_name + "_" + target_name + "_" + shard + ".csv"), compression)
+    return {"key": os.path.relpath(partOut, callFolder), "organism": "org", "target_name": target_name,
+            "srna_name": srna_name, "call": "IntaRNA", "out": out, "partOut": partOut}
+
+
+class ResumeAfterCompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.callFolder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.callFolder)
+
+    # A finished run: one unsharded call and two shards of another target, the shard outputs are merged and removed
+    def finishedRun(self):
+        manifest = createManifest(self.callFolder, {"shards": 2})
+        single = callJob(self.callFolder, "sRNA", "T1", "none")
+        with open(single["out"], "w") as f:
+            f.write("id1;E\nb1;-9.5\n")
+        updateJob(manifest, single["key"], state="done", checksum=fileChecksum(single["out"]))
+
+        shards = [callJob(self.callFolder, "sRNA", "T2", "none", shard) for shard in ["shard1of2", "shard2of2"]]
+        os.makedirs(os.path.dirname(shards[0]["partOut"]))
+        for job in shards:
+            with open(job["partOut"], "w") as f:
+                f.write("id1;E\n%s;-7.25\n" % job["key"])
+            updateJob(manifest, job["key"], state="done", checksum=fileChecksum(job["partOut"]))
+        with open(shards[0]["out"], "w") as f:
+            f.write("id1;E\n" + "".join("%s;-7.25\n" % job["key"] for job in shards))
+        recordOutput(manifest, os.path.basename(shards[0]["out"]), shards[0]["out"])
+        for job in shards:
+            os.remove(job["partOut"])
+        commitJournal(manifest["journal"])
+        return [single["out"], shards[0]["out"]]
+
+    def test_resume_reuses_all_calls(self):
+        outputs = self.finishedRun()
+        updateManifest(self.callFolder, "gzip", [compressFile("gzip", path) for path in outputs])
+
+        manifest = loadManifest(self.callFolder)
+        jobs = [callJob(self.callFolder, "sRNA", "T1", "gzip")] + \
+            [callJob(self.callFolder, "sRNA", "T2", "gzip", shard) for shard in ["shard1of2", "shard2of2"]]
+        self.assertEqual(sorted(manifest["jobs"]), sorted(job["key"] for job in jobs))
+        complete = registerJobs(manifest, jobs)
+        commitJournal(manifest["journal"])
+        self.assertEqual(complete, dict((job["key"], True) for job in jobs))
+
+    def test_compressed_checksums(self):
+        outputs = self.finishedRun()
+        updateManifest(self.callFolder, "gzip", [compressFile("gzip", path) for path in outputs])
+
+        manifest = loadManifest(self.callFolder)
+        self.assertEqual(manifest["settings"]["compression"], "gzip")
+        self.assertEqual(manifest["jobs"]["sRNA_T1.csv.gz"]["checksum"],
+                         fileChecksum(os.path.join(self.callFolder, "sRNA_T1.csv.gz")))
+        self.assertEqual(manifest["outputs"], {"sRNA_T2.csv.gz": fileChecksum(os.path.join(self.callFolder, "sRNA_T2.csv.gz"))})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import os
+import sys
+import operator
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin"))
+
+from rankCurves import rankCurves, differenceTable
+
+########################################################################################################################
+#                                                                                                                      #
+#          The rank-at-k curves of rankCurves.py equal the curves the plot scripts computed for each k and callID,     #
+#               the table of differences to a reference curve equals the box plot table built row by row.              #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# A toy benchmark table (as merged by mergeBenchmarks.py) with ranks of verified interactions not found (sys.maxsize)
+def randomBenchmark(rng, nInteractions, callIDs):
+    df = pd.DataFrame({"srna_name": rng.choice(["ArcZ", "ChiX", "OxyS"], nInteractions),
+                       "target_ltag": ["b%04d" % i for i in range(nInteractions)],
+                       "target_name": ["t%d" % i for i in range(nInteractions)]})
+    for callID in callIDs:
+        ranks = rng.integers(1, 260, nInteractions)
+        ranks[rng.random(nInteractions) < 0.1] = sys.maxsize
+        df[callID + "_intarna_rank"] = ranks
+    return df
+
+
+# The curves as computed by the plot scripts: the interactions with rank <= k, filtered for each k and callID
+def filteredCurves(benchDF, start, end):
+    prefix = ["srna_name", "target_ltag", "target_name"]
+    intarnaIDs = [x.replace("_intarna_rank", "") for x in benchDF.columns if x not in prefix]
+    rankDictionary = dict()
+    for entry in intarnaIDs:
+        rankDictionary[entry] = []
+    for i in range(start, end):
+        for id in intarnaIDs:
+            rankDictionary[id].append(len(benchDF[benchDF[id + "_intarna_rank"] <= i]))
+    return rankDictionary
+
+
+class RankCurvesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.benchDF = randomBenchmark(np.random.default_rng(24), 150, ["call1", "call2", "call10"])
+
+    def test_equal_to_filtered_curves(self):
+        for start, end in [(1, 200), (0, 200), (1, 2), (0, 300)]:
+            self.assertEqual(rankCurves(self.benchDF, start, end), filteredCurves(self.benchDF, start, end))
+
+    def test_facets(self):
+        curves = rankCurves(self.benchDF, 1, 100, self.benchDF["srna_name"])
+        self.assertEqual(sorted(curves), ["ArcZ", "ChiX", "OxyS"])
+        for srna_name, facetCurves in curves.items():
+            facetDF = self.benchDF[self.benchDF["srna_name"] == srna_name]
+            self.assertEqual(facetCurves, filteredCurves(facetDF, 1, 100))
+
+    def test_no_interactions(self):
+        self.assertEqual(rankCurves(self.benchDF.iloc[:0], 1, 5),
+                         dict((x, [0] * 4) for x in ["call1", "call2", "call10"]))
+
+
+# The box plot table as built by plot_boxes.py: one row per key, threshold and difference up to the threshold
+def rowWiseTable(rankDictionary, refData, keys, thresholds):
+    boxDataFrame = pd.DataFrame(index=np.arange(0, sum(thresholds) * len(keys)), columns=["key", "threshold", "value"])
+    idx = 0
+    for key in keys:
+        boxData = list(map(operator.sub, rankDictionary[key], refData))
+        for threshold in thresholds:
+            for value in boxData[:threshold]:
+                boxDataFrame.loc[idx] = [key, threshold, value]
+                idx += 1
+    boxDataFrame["value"] = boxDataFrame["value"].astype(int)
+    return boxDataFrame
+
+
+class DifferenceTableTest(unittest.TestCase):
+
+    def assertRowWiseTable(self, curves, reference, keys, thresholds):
+        table = differenceTable(curves, reference, keys, thresholds)
+        expected = rowWiseTable(curves, reference, keys, thresholds)
+        self.assertEqual(list(table.columns), ["key", "threshold", "value"])
+        self.assertEqual(table["key"].astype(str).tolist(), expected["key"].astype(str).tolist())
+        self.assertEqual(table["threshold"].astype(int).tolist(), expected["threshold"].astype(int).tolist())
+        self.assertEqual(table["value"].astype(int).tolist(), expected["value"].astype(int).tolist())
+
+    def test_equal_to_row_wise_table(self):
+        benchDF = randomBenchmark(np.random.default_rng(25), 120, ["call1", "call2", "call10", "ref"])
+        curves = rankCurves(benchDF, 0, 200)
+        reference = curves.pop("ref")
+        keys = sorted(curves)
+        for thresholds in [[200], [10, 50, 200], [1, 2, 3], [5, 5]]:
+            self.assertRowWiseTable(curves, reference, keys, thresholds)
+
+    def test_one_key(self):
+        self.assertRowWiseTable({"a": [0, 2, 5, 5]}, [1, 1, 3, 6], ["a"], [2, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
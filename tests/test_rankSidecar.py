@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin"))
+
+from benchmark import outputRanks
+from rankSidecar import updateSidecar, sidecarRanks, sidecarPath
+
+########################################################################################################################
+#                                                                                                                      #
+#          Ranks looked up in the sidecar of an output equal the ranks parsed from the output, stale sidecars          #
+#                                                    are not used.                                                     #
+#                                                                                                                      #
+########################################################################################################################
+
+
+# Write a toy IntaRNA output (--outMode C) with the given target ids and energies
+def writeOutput(path, ids, energies):
+    with open(path, "w") as f:
+        print("id1;start1;end1;id2;start2;end2;E", file=f)
+        for i, (id1, energy) in enumerate(zip(ids, energies)):
+            print("%s;%d;%d;query;1;8;%s" % (id1, i + 1, i + 8, energy), file=f)
+
+
+class SidecarRanksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "sRNA_T.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_equal_to_output_ranks(self):
+        rng = np.random.default_rng(23)
+        for nRows, nTargets in [(1, 1), (60, 12), (500, 80)]:
+            ids = ["b%04d" % x for x in rng.integers(0, nTargets, nRows)]
+            energies = np.round(rng.choice(np.arange(-25, 0, 0.5), nRows) + rng.choice([0, 0.002], nRows), 3)
+            writeOutput(self.path, ids, energies)
+            self.assertTrue(updateSidecar(self.path, force=True))
+            ltags = set(ids[::2]) | {"missing"}
+            self.assertEqual(sidecarRanks(self.path, ltags), outputRanks(self.path, ltags))
+
+    def test_empty_output(self):
+        writeOutput(self.path, [], [])
+        self.assertTrue(updateSidecar(self.path))
+        self.assertEqual(sidecarRanks(self.path, {"b1"}), dict())
+
+    def test_stale_sidecar(self):
+        writeOutput(self.path, ["b1", "b2"], [-5.0, -6.0])
+        self.assertTrue(updateSidecar(self.path))
+        self.assertFalse(updateSidecar(self.path))
+        # an output replaced by an older file (cache hardlink, cp -p) keeps an older modification time
+        stat = os.stat(self.path)
+        writeOutput(self.path, ["b1", "b2", "b3"], [-7.0, -6.0, -8.0])
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+        self.assertIsNone(sidecarRanks(self.path, {"b1"}))
+        self.assertTrue(updateSidecar(self.path))
+        self.assertEqual(sidecarRanks(self.path, {"b1", "b2", "b3"}), {"b3": 1, "b1": 2, "b2": 3})
+
+    def test_missing_sidecar(self):
+        writeOutput(self.path, ["b1"], [-5.0])
+        self.assertFalse(os.path.exists(sidecarPath(self.path)))
+        self.assertIsNone(sidecarRanks(self.path, {"b1"}))
+
+
+if __name__ == "__main__":
+    unittest.main()